@@ -2,133 +2,141 @@
 Data Augmentation for POC Dataset
 Expands the dataset by creating augmented copies of existing images
 Uses only OpenCV - no additional libraries needed
+
+Source images are spread over a process pool; each image is read once and
+all of its copies are generated from a generator seeded by (seed, image
+name, copy index), so the output is identical however many workers run.
 """
-import cv2
-import numpy as np
+import argparse
 import os
 import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-import random
-
-def augment_image_and_boxes(image, bboxes, class_labels):
-    """Apply random augmentations to image and adjust bounding boxes"""
-    h, w = image.shape[:2]
-    aug_image = image.copy()
-    aug_bboxes = bboxes.copy()
-    
-    # Horizontal flip (50% chance)
-    if random.random() > 0.5:
-        aug_image = cv2.flip(aug_image, 1)
-        for i, bbox in enumerate(aug_bboxes):
-            aug_bboxes[i][0] = 1.0 - bbox[0]  # Flip x_center
-    
-    # Brightness & Contrast
-    alpha = random.uniform(0.7, 1.3)  # Contrast
-    beta = random.randint(-30, 30)  # Brightness
-    aug_image = cv2.convertScaleAbs(aug_image, alpha=alpha, beta=beta)
-    
-    # Add Gaussian noise (30% chance)
-    if random.random() > 0.7:
-        noise = np.random.normal(0, 15, aug_image.shape).astype(np.uint8)
-        aug_image = cv2.add(aug_image, noise)
-    
-    # Gaussian blur (30% chance)
-    if random.random() > 0.7:
-        aug_image = cv2.GaussianBlur(aug_image, (5, 5), 0)
-    
-    # Hue/Saturation adjustment
-    hsv = cv2.cvtColor(aug_image, cv2.COLOR_BGR2HSV).astype(np.float32)
-    hsv[:, :, 0] = (hsv[:, :, 0] + random.randint(-10, 10)) % 180
-    hsv[:, :, 1] = np.clip(hsv[:, :, 1] * random.uniform(0.8, 1.2), 0, 255)
-    hsv[:, :, 2] = np.clip(hsv[:, :, 2] * random.uniform(0.8, 1.2), 0, 255)
-    aug_image = cv2.cvtColor(hsv.astype(np.uint8), cv2.COLOR_HSV2BGR)
-    
-    return aug_image, aug_bboxes, class_labels
-
-# Paths
-source_images = Path("POC/images")
-source_labels = Path("POC/labels")
-output_images = Path("POC_augmented/images")
-output_labels = Path("POC_augmented/labels")
-
-# Create output directories
-output_images.mkdir(parents=True, exist_ok=True)
-output_labels.mkdir(parents=True, exist_ok=True)
-
-print("Starting data augmentation...")
-print(f"Source images: {len(list(source_images.glob('*.jpg')))}")
-
-# Number of augmentations per image
-num_augmentations = 3
-
-total_created = 0
-
-for img_file in source_images.glob("*.jpg"):
-    # Read image
-    image = cv2.imread(str(img_file))
-    
-    # Read corresponding label
-    label_file = source_labels / f"{img_file.stem}.txt"
-    
+
+import cv2
+
+from augmentation import augment_sample, sample_rng, write_labels
+from label_index import load_label_index
+
+# Filled in each worker by init_worker
+_sources = []
+_options = {}
+_labels = None
+
+
+def init_worker(sources, labels_dir, options):
+    global _sources, _options, _labels
+    _sources = sources
+    _options = options
+    # Memory-mapped, so every worker shares the index the parent just cached
+    _labels = load_label_index(labels_dir)
+    # One OpenCV thread per process; the pool already uses every core
+    cv2.setNumThreads(1)
+
+
+def load_source(index):
+    """Read one source image and look up its labels"""
+    image_path = _sources[index][0]
+    classes, boxes = _labels.labels_for_stem(Path(image_path).stem)
+    return cv2.imread(image_path), classes, boxes
+
+
+def mosaic_partners(count, rng):
+    """Random other source images for a mosaic, chosen by the sample's generator"""
+    partners = []
+    for index in rng.choice(len(_sources), size=count, replace=len(_sources) < count):
+        image, classes, boxes = load_source(index)
+        if image is not None:
+            partners.append((image, classes, boxes))
+    return partners
+
+
+def augment_source(task):
+    """Copy one source image and write its augmented copies; returns copies written"""
+    index, output_images, output_labels, num_augmentations, seed = task
+    image_path, label_path = Path(_sources[index][0]), Path(_sources[index][1])
+
     # Copy original first
-    shutil.copy(img_file, output_images / img_file.name)
-    if label_file.exists():
-        shutil.copy(label_file, output_labels / label_file.name)
-    
-    # Parse bounding boxes
-    bboxes = []
-    class_labels = []
-    
-    if label_file.exists():
-        with open(label_file, 'r') as f:
-            for line in f.readlines():
-                parts = line.strip().split()
-                if len(parts) == 5:
-                    class_id = int(parts[0])
-                    x_center, y_center, width, height = map(float, parts[1:])
-                    bboxes.append([x_center, y_center, width, height])
-                    class_labels.append(class_id)
-    
-    # Create augmentations
+    shutil.copy(image_path, output_images / image_path.name)
+    if label_path.exists():
+        shutil.copy(label_path, output_labels / label_path.name)
+
+    image, classes, boxes = load_source(index)
+    if image is None:
+        print(f"Error reading {image_path.name}")
+        return 0
+
+    partners = mosaic_partners if len(_sources) > 1 else None
+    created = 0
     for aug_idx in range(num_augmentations):
         try:
-            # Apply augmentation
-            if bboxes:
-                aug_image, aug_bboxes, aug_labels = augment_image_and_boxes(
-                    image, np.array(bboxes), class_labels
-                )
-            else:
-                aug_image = image.copy()
-                # Apply same transformations without boxes
-                if random.random() > 0.5:
-                    aug_image = cv2.flip(aug_image, 1)
-                alpha = random.uniform(0.7, 1.3)
-                beta = random.randint(-30, 30)
-                aug_image = cv2.convertScaleAbs(aug_image, alpha=alpha, beta=beta)
-                aug_bboxes = []
-                aug_labels = []
-            
-            # Save augmented image
-            aug_img_name = f"{img_file.stem}_aug{aug_idx}.jpg"
-            aug_img_path = output_images / aug_img_name
-            cv2.imwrite(str(aug_img_path), aug_image)
-            
-            # Save augmented labels
-            aug_label_path = output_labels / f"{img_file.stem}_aug{aug_idx}.txt"
-            with open(aug_label_path, 'w') as f:
-                for bbox, label in zip(aug_bboxes, aug_labels):
-                    f.write(f"{label} {bbox[0]} {bbox[1]} {bbox[2]} {bbox[3]}\n")
-            
-            total_created += 1
-            
+            rng = sample_rng(seed, image_path.stem, aug_idx)
+            aug_image, aug_classes, aug_boxes = augment_sample(
+                image, classes, boxes, rng, _options, mosaic_partners=partners
+            )
+            aug_name = f"{image_path.stem}_aug{aug_idx}"
+            cv2.imwrite(str(output_images / f"{aug_name}.jpg"), aug_image)
+            write_labels(output_labels / f"{aug_name}.txt", aug_classes, aug_boxes)
+            created += 1
         except Exception as e:
-            print(f"Error augmenting {img_file.name}: {e}")
-            continue
-    
-    if total_created % 50 == 0:
-        print(f"Created {total_created} augmented images...")
-
-print(f"\n✅ Augmentation complete!")
-print(f"📊 Original images: {len(list(source_images.glob('*.jpg')))}")
-print(f"📊 Total images (original + augmented): {len(list(output_images.glob('*.jpg')))}")
-print(f"📁 Output: POC_augmented/")
+            print(f"Error augmenting {image_path.name}: {e}")
+    return created
+
+
+def augment_dataset(source_dir="POC", output_dir="POC_augmented", num_augmentations=3,
+                    seed=0, workers=None, options=None):
+    """Write originals plus num_augmentations copies of each image to output_dir"""
+    source_images = Path(source_dir) / "images"
+    source_labels = Path(source_dir) / "labels"
+    output_images = Path(output_dir) / "images"
+    output_labels = Path(output_dir) / "labels"
+
+    # Create output directories
+    output_images.mkdir(parents=True, exist_ok=True)
+    output_labels.mkdir(parents=True, exist_ok=True)
+
+    image_files = sorted(source_images.glob("*.jpg"))
+    sources = [(str(p), str(source_labels / f"{p.stem}.txt")) for p in image_files]
+    workers = workers or os.cpu_count() or 1
+    labels = load_label_index(source_labels, image_files)
+
+    print("Starting data augmentation...")
+    print(f"Source images: {len(sources)}")
+    print(f"Source boxes per class: {labels.class_counts().tolist()}")
+    print(f"Workers: {workers}")
+
+    tasks = [(i, output_images, output_labels, num_augmentations, seed) for i in range(len(sources))]
+    total_created = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(sources, source_labels, options or {})) as executor:
+        chunksize = max(1, len(tasks) // (workers * 8))
+        for done, created in enumerate(executor.map(augment_source, tasks, chunksize=chunksize), 1):
+            total_created += created
+            if done % 50 == 0:
+                rate = done / (time.perf_counter() - start)
+                print(f"Processed {done}/{len(tasks)} source images ({rate:.1f} img/s)...")
+
+    print(f"\n✅ Augmentation complete!")
+    print(f"📊 Original images: {len(sources)}")
+    print(f"📊 Augmented images created: {total_created}")
+    print(f"📊 Total images (original + augmented): {len(list(output_images.glob('*.jpg')))}")
+    print(f"⏱️  {time.perf_counter() - start:.1f}s")
+    print(f"📁 Output: {output_dir}/")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create augmented copies of a YOLO dataset")
+    parser.add_argument('--source', default='POC', help="Dataset with images/ and labels/")
+    parser.add_argument('--output', default='POC_augmented')
+    parser.add_argument('--num', type=int, default=3, help="Augmented copies per image")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None, help="Processes (default: all cores)")
+    parser.add_argument('--mosaic', type=float, default=None, help="Mosaic probability (0 disables)")
+    args = parser.parse_args()
+
+    options = {}
+    if args.mosaic is not None:
+        options["mosaic"] = args.mosaic
+    augment_dataset(args.source, args.output, args.num, args.seed, args.workers, options)
@@ -0,0 +1,225 @@
+"""
+Vectorized image + bounding box augmentation for YOLO datasets
+Shared by augment_dataset.py (materialized copies) and the training scripts
+
+Boxes are handled as NumPy arrays: labels come in as (N,) class ids and
+(N, 4) normalized xywh boxes (see label_index.py), converted to pixel xyxy
+for the geometric transforms and back again. Every random choice comes from a NumPy Generator
+seeded per (image, augmentation index), so a run is reproducible no matter
+how work is spread across processes.
+"""
+import zlib
+
+import cv2
+import numpy as np
+
+DEFAULT_OPTIONS = {
+    "flip": 0.5,               # horizontal flip probability
+    "scale": (0.8, 1.2),       # random zoom range
+    "degrees": 10.0,           # max rotation either way
+    "translate": 0.1,          # max shift as a fraction of width/height
+    "crop": 0.3,               # probability of a random crop
+    "crop_min": 0.6,           # smallest crop side as a fraction of the image
+    "mosaic": 0.2,             # probability of a 2x2 mosaic (needs partner images)
+    "mosaic_size": 640,
+    "contrast": (0.7, 1.3),
+    "brightness": 30,
+    "hue": 10,
+    "saturation": (0.8, 1.2),
+    "value": (0.8, 1.2),
+    "noise": 0.3,              # Gaussian noise probability
+    "noise_sigma": 15.0,
+    "blur": 0.3,               # Gaussian blur probability
+    "min_visible": 0.25,       # drop boxes with less of their area left in frame
+}
+
+FILL_VALUE = 114
+
+
+def sample_rng(seed, stem, aug_idx):
+    """Deterministic generator for one augmented copy of one source image"""
+    return np.random.default_rng([seed, zlib.crc32(stem.encode()), aug_idx])
+
+
+def write_labels(label_path, classes, boxes):
+    """Write classes and normalized xywh boxes as a YOLO label file"""
+    with open(label_path, 'w') as f:
+        for cls_id, (x, y, w, h) in zip(classes, boxes):
+            f.write(f"{int(cls_id)} {x:.6f} {y:.6f} {w:.6f} {h:.6f}\n")
+
+
+def xywhn_to_xyxy(boxes, width, height):
+    xyxy = np.empty_like(boxes, dtype=np.float32)
+    xyxy[:, 0] = (boxes[:, 0] - boxes[:, 2] / 2) * width
+    xyxy[:, 1] = (boxes[:, 1] - boxes[:, 3] / 2) * height
+    xyxy[:, 2] = (boxes[:, 0] + boxes[:, 2] / 2) * width
+    xyxy[:, 3] = (boxes[:, 1] + boxes[:, 3] / 2) * height
+    return xyxy
+
+
+def xyxy_to_xywhn(boxes, width, height):
+    xywh = np.empty_like(boxes, dtype=np.float32)
+    xywh[:, 0] = (boxes[:, 0] + boxes[:, 2]) / 2 / width
+    xywh[:, 1] = (boxes[:, 1] + boxes[:, 3]) / 2 / height
+    xywh[:, 2] = (boxes[:, 2] - boxes[:, 0]) / width
+    xywh[:, 3] = (boxes[:, 3] - boxes[:, 1]) / height
+    return xywh
+
+
+def clip_boxes(classes, boxes, width, height, min_visible=0.25, min_size=2.0):
+    """Clip pixel xyxy boxes to the frame, dropping ones that are mostly cut off"""
+    area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    clipped = boxes.copy()
+    clipped[:, [0, 2]] = clipped[:, [0, 2]].clip(0, width)
+    clipped[:, [1, 3]] = clipped[:, [1, 3]].clip(0, height)
+    bw = clipped[:, 2] - clipped[:, 0]
+    bh = clipped[:, 3] - clipped[:, 1]
+    keep = (bw > min_size) & (bh > min_size) & (bw * bh >= min_visible * np.maximum(area, 1e-6))
+    return classes[keep], clipped[keep]
+
+
+def random_affine(image, boxes, rng, options):
+    """One warp for flip, scale, rotation and translation; boxes are remapped by their corners"""
+    h, w = image.shape[:2]
+    angle = rng.uniform(-options["degrees"], options["degrees"])
+    scale = rng.uniform(*options["scale"])
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, scale)
+    if rng.random() < options["flip"]:
+        # Mirror (x -> w - x) before rotating: compose the flip into the matrix
+        matrix[:, 2] += matrix[:, 0] * w
+        matrix[:, 0] *= -1
+    matrix[0, 2] += rng.uniform(-options["translate"], options["translate"]) * w
+    matrix[1, 2] += rng.uniform(-options["translate"], options["translate"]) * h
+
+    warped = cv2.warpAffine(image, matrix, (w, h), borderValue=(FILL_VALUE,) * 3)
+    if len(boxes) == 0:
+        return warped, boxes
+
+    corners = boxes[:, [0, 1, 2, 1, 2, 3, 0, 3]].reshape(-1, 4, 2)
+    corners = corners @ matrix[:, :2].T + matrix[:, 2]
+    remapped = np.concatenate([corners.min(axis=1), corners.max(axis=1)], axis=1).astype(np.float32)
+    return warped, remapped
+
+
+def random_crop(image, boxes, rng, options):
+    """Crop a random window and shift the boxes into it"""
+    h, w = image.shape[:2]
+    cw = int(w * rng.uniform(options["crop_min"], 1.0))
+    ch = int(h * rng.uniform(options["crop_min"], 1.0))
+    x0 = int(rng.integers(0, w - cw + 1))
+    y0 = int(rng.integers(0, h - ch + 1))
+    boxes = boxes - np.array([x0, y0, x0, y0], dtype=np.float32)
+    return image[y0:y0 + ch, x0:x0 + cw], boxes
+
+
+def color_jitter(image, rng, options):
+    """Contrast/brightness and HSV jitter, all as uint8 lookup tables"""
+    x = np.arange(256, dtype=np.float32)
+    alpha = rng.uniform(*options["contrast"])
+    beta = rng.integers(-options["brightness"], options["brightness"] + 1)
+    image = cv2.LUT(image, np.clip(x * alpha + beta, 0, 255).astype(np.uint8))
+
+    hue, sat, val = cv2.split(cv2.cvtColor(image, cv2.COLOR_BGR2HSV))
+    dh = rng.integers(-options["hue"], options["hue"] + 1)
+    hue = cv2.LUT(hue, ((x + dh) % 180).astype(np.uint8))
+    sat = cv2.LUT(sat, np.clip(x * rng.uniform(*options["saturation"]), 0, 255).astype(np.uint8))
+    val = cv2.LUT(val, np.clip(x * rng.uniform(*options["value"]), 0, 255).astype(np.uint8))
+    return cv2.cvtColor(cv2.merge((hue, sat, val)), cv2.COLOR_HSV2BGR)
+
+
+def add_noise(image, rng, sigma):
+    noise = rng.standard_normal(image.shape, dtype=np.float32) * sigma
+    return cv2.add(image, noise, dtype=cv2.CV_8U)
+
+
+def mosaic(samples, rng, size=640, min_visible=0.25):
+    """
+    Combine four (image, classes, pixel xyxy boxes) samples into one 2x2 mosaic
+
+    The images are placed around a random centre on a 2*size canvas and a
+    size x size window around that centre is cut out.
+    """
+    canvas = np.full((2 * size, 2 * size, 3), FILL_VALUE, dtype=np.uint8)
+    xc, yc = (int(v) for v in rng.uniform(0.5 * size, 1.5 * size, 2))
+    all_classes, all_boxes = [], []
+    for i, (image, classes, boxes) in enumerate(samples[:4]):
+        h, w = image.shape[:2]
+        scale = size / max(h, w)
+        if scale != 1:
+            image = cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))),
+                               interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+            boxes = boxes * scale
+            h, w = image.shape[:2]
+
+        if i == 0:    # top left
+            x1a, y1a, x2a, y2a = max(xc - w, 0), max(yc - h, 0), xc, yc
+            x1b, y1b = w - (x2a - x1a), h - (y2a - y1a)
+        elif i == 1:  # top right
+            x1a, y1a, x2a, y2a = xc, max(yc - h, 0), min(xc + w, 2 * size), yc
+            x1b, y1b = 0, h - (y2a - y1a)
+        elif i == 2:  # bottom left
+            x1a, y1a, x2a, y2a = max(xc - w, 0), yc, xc, min(2 * size, yc + h)
+            x1b, y1b = w - (x2a - x1a), 0
+        else:         # bottom right
+            x1a, y1a, x2a, y2a = xc, yc, min(xc + w, 2 * size), min(2 * size, yc + h)
+            x1b, y1b = 0, 0
+        canvas[y1a:y2a, x1a:x2a] = image[y1b:y1b + (y2a - y1a), x1b:x1b + (x2a - x1a)]
+
+        # Boxes move with the image but are clipped to the part that was pasted
+        shifted = boxes + np.array([x1a - x1b, y1a - y1b] * 2, dtype=np.float32)
+        visible = shifted.copy()
+        visible[:, [0, 2]] = visible[:, [0, 2]].clip(x1a, x2a)
+        visible[:, [1, 3]] = visible[:, [1, 3]].clip(y1a, y2a)
+        area = (shifted[:, 2] - shifted[:, 0]) * (shifted[:, 3] - shifted[:, 1])
+        kept = ((visible[:, 2] - visible[:, 0]) * (visible[:, 3] - visible[:, 1])
+                >= min_visible * np.maximum(area, 1e-6))
+        all_classes.append(classes[kept])
+        all_boxes.append(visible[kept])
+
+    x0, y0 = xc - size // 2, yc - size // 2
+    boxes = np.concatenate(all_boxes) - np.array([x0, y0, x0, y0], dtype=np.float32)
+    classes = np.concatenate(all_classes)
+    classes, boxes = clip_boxes(classes, boxes, size, size, min_visible)
+    return canvas[y0:y0 + size, x0:x0 + size].copy(), classes, boxes
+
+
+def augment_sample(image, classes, boxes, rng, options=None, mosaic_partners=None):
+    """
+    Produce one augmented copy of an image and its labels
+
+    Args:
+        image: BGR uint8 image
+        classes: (N,) class ids
+        boxes: (N, 4) normalized xywh boxes
+        rng: NumPy Generator, e.g. from sample_rng()
+        options: overrides for DEFAULT_OPTIONS
+        mosaic_partners: callable(count, rng) returning that many
+            (image, classes, xywhn boxes) samples to build a mosaic from
+
+    Returns (image, classes, normalized xywh boxes).
+    """
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    h, w = image.shape[:2]
+    xyxy = xywhn_to_xyxy(boxes, w, h)
+
+    if mosaic_partners is not None and rng.random() < options["mosaic"]:
+        samples = [(image, classes, xyxy)]
+        for part_image, part_classes, part_boxes in mosaic_partners(3, rng):
+            ph, pw = part_image.shape[:2]
+            samples.append((part_image, part_classes, xywhn_to_xyxy(part_boxes, pw, ph)))
+        image, classes, xyxy = mosaic(samples, rng, options["mosaic_size"], options["min_visible"])
+    else:
+        image, xyxy = random_affine(image, xyxy, rng, options)
+        if rng.random() < options["crop"]:
+            image, xyxy = random_crop(image, xyxy, rng, options)
+
+    h, w = image.shape[:2]
+    classes, xyxy = clip_boxes(classes, xyxy, w, h, options["min_visible"])
+
+    image = color_jitter(image, rng, options)
+    if rng.random() < options["noise"]:
+        image = add_noise(image, rng, options["noise_sigma"])
+    if rng.random() < options["blur"]:
+        image = cv2.GaussianBlur(image, (5, 5), 0)
+
+    return image, classes, xyxy_to_xywhn(xyxy, w, h)
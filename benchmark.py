@@ -0,0 +1,218 @@
+"""
+Inference latency / throughput benchmark over POC_split/val
+Runs a checkpoint (or one of its exported runtimes) over the validation
+images at several batch sizes, thread counts and input sizes and writes
+per-stage timings, latency percentiles, images/sec and peak RSS to JSON
+
+Each configuration runs in its own fresh process pinned to its thread
+count's cores, so ONNX Runtime / OpenVINO thread pools, which are sized
+once at load time, see the intended budget too, and peak RSS (a
+process-lifetime high-water mark) belongs to that configuration alone.
+
+Usage:
+    python benchmark.py --runtime openvino --batch 1 4 8 --threads 1 2 4 --imgsz 320 640
+    python benchmark.py --compare bench_pt.json -o bench_openvino.json --runtime openvino
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import detections as dets
+from cpu_affinity import pin_worker
+from dataset_split import list_images
+from model_loader import DEFAULT_MODEL, resolve_model_path
+
+STAGES = ("decode", "preprocess", "inference", "postprocess", "plot", "encode")
+
+
+def peak_rss_mb():
+    """
+    High-water mark of this process's resident memory, or None if unavailable
+
+    This covers the whole process lifetime, so it is only a per-config
+    number because every config runs in a fresh process.
+    """
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 ** 2 if platform.system() == "Darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 1024 ** 2
+    except ImportError:
+        return None
+
+
+def percentiles(values):
+    values = np.asarray(values)
+    return {
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+    }
+
+
+def run_config(model, image_paths, batch_size, imgsz, conf=0.25, warmup_batches=2):
+    """Time every stage of the full detect -> plot -> encode path for one configuration"""
+    batches = [image_paths[i:i + batch_size] for i in range(0, len(image_paths), batch_size)]
+    for batch in batches[:warmup_batches]:
+        model([cv2.imread(str(p)) for p in batch], imgsz=imgsz, conf=conf, verbose=False)
+
+    stage_ms = {stage: [] for stage in STAGES}
+    batch_ms = []
+    start_all = time.perf_counter()
+    for batch in batches:
+        start = time.perf_counter()
+        images = []
+        for path in batch:
+            t = time.perf_counter()
+            images.append(cv2.imread(str(path)))
+            stage_ms["decode"].append((time.perf_counter() - t) * 1000)
+
+        results = model(images, imgsz=imgsz, conf=conf, verbose=False)
+        for image, result in zip(images, results):
+            # Ultralytics reports per-image preprocess / inference / NMS times
+            for stage in ("preprocess", "inference", "postprocess"):
+                stage_ms[stage].append(result.speed[stage])
+            detections = dets.from_result(result)
+
+            t = time.perf_counter()
+            annotated = dets.draw_detections(image, detections, model.names)
+            stage_ms["plot"].append((time.perf_counter() - t) * 1000)
+
+            t = time.perf_counter()
+            cv2.imencode('.jpg', annotated)
+            stage_ms["encode"].append((time.perf_counter() - t) * 1000)
+        batch_ms.append((time.perf_counter() - start) * 1000)
+    elapsed = time.perf_counter() - start_all
+
+    return {
+        "batch": batch_size,
+        "imgsz": imgsz,
+        "images": len(image_paths),
+        "stages_ms": {stage: float(np.mean(values)) for stage, values in stage_ms.items()},
+        "batch_latency_ms": percentiles(batch_ms),
+        "per_image_ms": float(elapsed * 1000 / len(image_paths)),
+        "images_per_sec": float(len(image_paths) / elapsed),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def init_bench_worker(core_queue):
+    pin_worker(core_queue)
+
+
+def run_config_in_worker(model_path, image_paths, batch_size, imgsz, conf, threads):
+    """One configuration inside a fresh pinned worker, model load included in its peak RSS"""
+    from ultralytics import YOLO
+
+    model = YOLO(str(model_path), task="detect")
+    record = run_config(model, image_paths, batch_size, imgsz, conf)
+    record["threads"] = threads
+    print(f"  threads={threads} imgsz={imgsz} batch={batch_size}: "
+          f"{record['images_per_sec']:.1f} img/s, p95 {record['batch_latency_ms']['p95']:.0f} ms/batch")
+    return record
+
+
+def benchmark(model_path=DEFAULT_MODEL, runtime="pt", images_dir="POC_split/val/images",
+              batch_sizes=(1, 4, 8), thread_counts=(1, 2, 4), imgszs=(640,), conf=0.25, max_images=None):
+    """Run the full matrix and return the JSON-ready report"""
+    model_path, runtime = resolve_model_path(model_path, runtime)
+    image_paths = list_images(images_dir)[:max_images]
+    if not image_paths:
+        raise FileNotFoundError(f"No images found in {images_dir}")
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+
+    print(f"Benchmarking {model_path} ({runtime}) on {len(image_paths)} images")
+    ctx = multiprocessing.get_context("spawn")
+    configs = []
+    for threads in thread_counts:
+        for imgsz in imgszs:
+            for batch_size in batch_sizes:
+                core_queue = ctx.Queue()
+                core_queue.put(cores[:threads])
+                with ProcessPoolExecutor(max_workers=1, mp_context=ctx, initializer=init_bench_worker,
+                                         initargs=(core_queue,)) as executor:
+                    configs.append(executor.submit(
+                        run_config_in_worker, model_path, image_paths, batch_size, imgsz, conf, threads
+                    ).result())
+
+    return {
+        "model": str(model_path),
+        "runtime": runtime,
+        "model_mtime": int(os.path.getmtime(model_path)),
+        "images_dir": str(images_dir),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"platform": platform.platform(), "processor": platform.processor(),
+                 "cpu_count": os.cpu_count(), "python": platform.python_version()},
+        "configs": configs,
+    }
+
+
+def config_key(config):
+    return (config["threads"], config["imgsz"], config["batch"])
+
+
+def compare(report, baseline):
+    """Print throughput and p95 changes against an earlier report"""
+    previous = {config_key(c): c for c in baseline["configs"]}
+    print(f"\nvs {baseline['model']} ({baseline['runtime']}, {baseline['created']}):")
+    for config in report["configs"]:
+        old = previous.get(config_key(config))
+        if old is None:
+            continue
+        speedup = config["images_per_sec"] / old["images_per_sec"]
+        p95_change = config["batch_latency_ms"]["p95"] / old["batch_latency_ms"]["p95"] - 1
+        print(f"  threads={config['threads']} imgsz={config['imgsz']} batch={config['batch']}: "
+              f"{speedup:.2f}x img/s, p95 {p95_change:+.0%}")
+
+
+def print_summary(report):
+    print(f"\n{'='*108}")
+    print(f"Benchmark: {report['model']} ({report['runtime']})")
+    print(f"{'='*108}")
+    header = "".join(f"{stage:>12}" for stage in STAGES)
+    print(f"{'thr':>4}{'imgsz':>6}{'batch':>6}{header}{'p50':>8}{'p95':>8}{'p99':>8}{'img/s':>8}{'RSS MB':>8}")
+    for c in report["configs"]:
+        stages = "".join(f"{c['stages_ms'][stage]:>12.2f}" for stage in STAGES)
+        lat = c["batch_latency_ms"]
+        rss = f"{c['peak_rss_mb']:.0f}" if c["peak_rss_mb"] is not None else "-"
+        print(f"{c['threads']:>4}{c['imgsz']:>6}{c['batch']:>6}{stages}"
+              f"{lat['p50']:>8.1f}{lat['p95']:>8.1f}{lat['p99']:>8.1f}{c['images_per_sec']:>8.1f}{rss:>8}")
+    print("Stage times are mean ms per image; p50/p95/p99 are ms per batch.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inference latency/throughput benchmark")
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--runtime', default='pt', help="pt, onnx, openvino, openvino-int8 or auto")
+    parser.add_argument('--images', default='POC_split/val/images', help="Image directory or .txt list")
+    parser.add_argument('--batch', nargs='+', type=int, default=[1, 4, 8])
+    parser.add_argument('--threads', nargs='+', type=int, default=[1, 2, 4])
+    parser.add_argument('--imgsz', nargs='+', type=int, default=[640])
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--max-images', type=int, default=None)
+    parser.add_argument('-o', '--output', default='benchmark.json')
+    parser.add_argument('--compare', help="Earlier benchmark JSON to compare against")
+    args = parser.parse_args()
+
+    report = benchmark(args.model, args.runtime, args.images, args.batch, args.threads,
+                       args.imgsz, args.conf, args.max_images)
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print_summary(report)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    print(f"\nResults written to: {args.output}")
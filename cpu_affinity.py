@@ -0,0 +1,40 @@
+"""
+CPU core partitioning for process pools
+Gives each worker process its own share of the cores so parallel inference
+workers or training trials do not oversubscribe the machine
+"""
+import os
+
+
+def split_cores(num_workers):
+    """Divide the cores available to this process into one share per worker"""
+    if hasattr(os, "sched_getaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    if len(cores) < num_workers:
+        return [[cores[i % len(cores)]] for i in range(num_workers)]
+    per_worker = len(cores) // num_workers
+    return [cores[i * per_worker:(i + 1) * per_worker] for i in range(num_workers)]
+
+
+def pin_worker(core_queue):
+    """
+    Pin the calling worker to the next core share from core_queue
+
+    Also sizes torch's thread pool to the share. Returns the cores, or None
+    when no share arrived (the worker then runs single-threaded, unpinned).
+    """
+    try:
+        cores = core_queue.get(timeout=5)
+    except Exception:
+        cores = None
+
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    # Imported here so processes that never pin do not pay for torch
+    import torch
+
+    torch.set_num_threads(len(cores) if cores else 1)
+    return cores
@@ -0,0 +1,201 @@
+"""
+Write train/val splits without copying the dataset
+Shared by split_dataset.py and split_dataset_stratified.py
+
+A split is written either as a manifest (train.txt / val.txt image lists
+that data.yaml points at, labels are found next to the source images) or as
+the usual train/images, train/labels layout filled with hardlinks or
+symlinks. Files are only copied when linking is not possible, and existing
+links that already point at the right file are left alone, so re-splitting
+only touches what changed.
+
+Splits are chosen per group (a source image and all of its augmented
+copies) with iterative stratification, so near-duplicates never straddle
+train and val while per-class box counts stay balanced.
+"""
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+SPLIT_MODES = ("manifest", "hardlink", "symlink", "copy")
+
+
+def label_for(image_path):
+    """YOLO label path for an image: .../images/x.jpg -> .../labels/x.txt"""
+    image_path = Path(image_path)
+    return image_path.parent.parent / "labels" / f"{image_path.stem}.txt"
+
+
+def iterative_stratification(group_counts, ratios, group_sizes=None, seed=42):
+    """
+    Assign groups to splits with multi-label iterative stratification
+
+    Follows Sechidis et al. (2011): repeatedly take the class held by the
+    fewest unassigned groups and give each of those groups to the split that
+    still needs the most boxes of that class, breaking ties by the split that
+    needs the most images, then at random.
+
+    Args:
+        group_counts: (groups, classes) box counts per group
+        ratios: target fraction per split, e.g. (0.7, 0.3)
+        group_sizes: images per group (default 1 each)
+        seed: seed for tie-breaking
+
+    Returns a (groups,) array with the split index of every group.
+    """
+    rng = np.random.default_rng(seed)
+    ratios = np.asarray(ratios, dtype=np.float64)
+    num_groups = len(group_counts)
+    group_sizes = np.ones(num_groups) if group_sizes is None else np.asarray(group_sizes, dtype=np.float64)
+
+    label_demand = ratios[:, None] * group_counts.sum(axis=0)[None, :]
+    image_demand = ratios * group_sizes.sum()
+    assignment = np.full(num_groups, -1, dtype=np.int64)
+    has_label = group_counts > 0
+    order = rng.permutation(num_groups)
+
+    def assign(group, demand):
+        candidates = np.flatnonzero(demand == demand.max())
+        if len(candidates) > 1:
+            candidates = candidates[image_demand[candidates] == image_demand[candidates].max()]
+        split = candidates[0] if len(candidates) == 1 else rng.choice(candidates)
+        assignment[group] = split
+        label_demand[split] -= group_counts[group]
+        image_demand[split] -= group_sizes[group]
+
+    while True:
+        active = has_label & (assignment == -1)[:, None]
+        per_label = active.sum(axis=0)
+        if not per_label.any():
+            break
+        label = int(np.argmin(np.where(per_label > 0, per_label, np.iinfo(np.int64).max)))
+        for group in order[active[order, label]]:
+            assign(group, label_demand[:, label])
+
+    # Groups without any boxes only balance the image counts
+    for group in order[assignment[order] == -1]:
+        assign(group, image_demand)
+    return assignment
+
+
+def list_images(source):
+    """
+    Image paths from a directory or a .txt image list
+
+    A split directory such as POC_split/val/images that was written as a
+    manifest is looked up as POC_split/val.txt instead. The manifest wins
+    over a directory left behind by an earlier linked or copied split, so
+    consumers never read a stale split that overlaps the new train set.
+    """
+    source = Path(source)
+    if source.suffix == ".txt":
+        with open(source) as f:
+            return [Path(line.strip()) for line in f if line.strip()]
+    manifest = source.parent.parent / f"{source.parent.name}.txt"
+    if source.name == "images" and manifest.exists():
+        return list_images(manifest)
+    if source.is_dir():
+        return sorted(source.glob("*.jpg"))
+    return []
+
+
+def is_current(src, dst, mode):
+    """Whether dst already is what place_file would create for src"""
+    if not dst.exists():
+        return False
+    if mode == "copy":
+        src_stat, dst_stat = os.stat(src), dst.stat()
+        return (not os.path.samefile(src, dst) and src_stat.st_size == dst_stat.st_size
+                and src_stat.st_mtime == dst_stat.st_mtime)
+    return os.path.samefile(src, dst) and dst.is_symlink() == (mode == "symlink")
+
+
+def place_file(src, dst, mode):
+    """Hardlink, symlink or copy src to dst, falling back down that list; returns the method used"""
+    if dst.exists() or dst.is_symlink():
+        if is_current(src, dst, mode):
+            return "kept"
+        dst.unlink()
+    methods = SPLIT_MODES[SPLIT_MODES.index(mode):] if mode in SPLIT_MODES[1:] else ("copy",)
+    for method in methods:
+        try:
+            if method == "hardlink":
+                os.link(src, dst)
+            elif method == "symlink":
+                os.symlink(Path(src).resolve(), dst)
+            else:
+                shutil.copy2(src, dst)
+            return method
+        except OSError:
+            continue
+    raise OSError(f"Could not place {src} at {dst}")
+
+
+def sync_directory(files, directory, mode):
+    """Make directory hold exactly files (by name), linking what is missing"""
+    directory.mkdir(parents=True, exist_ok=True)
+    wanted = {Path(f).name: Path(f) for f in files}
+    for existing in directory.iterdir():
+        if existing.name not in wanted:
+            existing.unlink()
+    used = {}
+    for name, src in wanted.items():
+        method = place_file(src, directory / name, mode)
+        used[method] = used.get(method, 0) + 1
+    return used
+
+
+def write_split(splits, output_dir, mode="manifest", names=None):
+    """
+    Write {split name: [image paths]} to output_dir and point data.yaml at it
+
+    names: class names for data.yaml; kept from an existing data.yaml in
+    output_dir when not given.
+    """
+    if mode not in SPLIT_MODES:
+        raise ValueError(f"mode must be one of {SPLIT_MODES}")
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    entries = {}
+    for split, images in splits.items():
+        images = [Path(p).resolve() for p in images]
+        if mode == "manifest":
+            with open(output_dir / f"{split}.txt", 'w') as f:
+                f.writelines(f"{p}\n" for p in images)
+            entries[split] = f"{split}.txt"
+            print(f"  {split}: {len(images)} images listed in {split}.txt")
+        else:
+            # A manifest from an earlier split would shadow these directories
+            (output_dir / f"{split}.txt").unlink(missing_ok=True)
+            labels = [label_for(p) for p in images if label_for(p).exists()]
+            used = sync_directory(images, output_dir / split / "images", mode)
+            sync_directory(labels, output_dir / split / "labels", mode)
+            entries[split] = f"{split}/images"
+            summary = ", ".join(f"{count} {method}" for method, count in sorted(used.items()))
+            print(f"  {split}: {len(images)} images ({summary})")
+
+    data_yaml = output_dir / "data.yaml"
+    data = {}
+    if data_yaml.exists():
+        with open(data_yaml) as f:
+            data = yaml.safe_load(f) or {}
+    if names is not None:
+        data["names"] = dict(enumerate(names)) if isinstance(names, list) else names
+        data["nc"] = len(data["names"])
+    data = {"path": str(output_dir.resolve()), **entries,
+            **{k: v for k, v in data.items() if k not in ("path", *entries)}}
+    with open(data_yaml, 'w') as f:
+        yaml.safe_dump(data, f, sort_keys=False, allow_unicode=True)
+    return data_yaml
+
+
+def load_class_names(data_yaml="POC/data.yaml"):
+    """Class names from a dataset yaml, or None if it does not exist"""
+    if not Path(data_yaml).exists():
+        return None
+    with open(data_yaml) as f:
+        return yaml.safe_load(f).get("names")
@@ -1,8 +1,9 @@
-from ultralytics import YOLO
 import cv2
 
+from model_loader import load_model
+
 # Load model
-model = YOLO('runs/detect/betty_haagen3/weights/best.pt')
+model = load_model('betty_haagen3')  # registry name from models.json
 
 # Test on single frame
 cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
@@ -1,9 +1,22 @@
-from ultralytics import YOLO
 import cv2
 import sys
 import os
+import argparse
+import csv
+import glob
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
-def detect_in_image(image_path, model_path='runs/detect/betty_haagen3/weights/best.pt', conf=0.25):
+import detections as dets
+from model_startup import start_model_loader
+from tiled_inference import compare_with_single_pass, detect_tiled
+
+DEFAULT_MODEL = 'betty_haagen3'  # registry name from models.json, or a checkpoint path
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp'}
+
+def detect_in_image(image_path, model_path=DEFAULT_MODEL, conf=0.25, tiled=False):
     """
     Detect products in a given image file
     
@@ -11,15 +24,16 @@ def detect_in_image(image_path, model_path='runs/detect/betty_haagen3/weights/be
         image_path: Path to the image file
         model_path: Path to the trained YOLO model
         conf: Confidence threshold (default 0.25)
+        tiled: Use sliced inference for high-resolution images
     """
     # Check if image exists
     if not os.path.exists(image_path):
         print(f"Error: Image file '{image_path}' not found!")
         return
     
-    # Load the trained model
-    print(f"Loading model from {model_path}...")
-    model = YOLO(model_path)
+    # Load and warm the model (fastest exported runtime if available) in
+    # the background while the image is read
+    loader = start_model_loader(model_path)
     
     # Read the image
     print(f"Reading image from {image_path}...")
@@ -28,32 +42,28 @@ def detect_in_image(image_path, model_path='runs/detect/betty_haagen3/weights/be
     if image is None:
         print(f"Error: Could not read image from '{image_path}'")
         return
+    model = loader.wait()
     
     # Run detection
-    print(f"Running detection with confidence threshold: {conf}")
-    results = model(image, conf=conf)
-    
-    # Get the result
-    result = results[0]
+    if tiled:
+        print(f"Running tiled detection with confidence threshold: {conf}")
+        detections, cost = compare_with_single_pass(model, image, conf=conf)
+        print(f"  {cost['tiles']} tiles: {cost['tiled_ms']:.0f} ms vs {cost['single_pass_ms']:.0f} ms single pass "
+              f"({cost['cost_ratio']:.1f}x cost, {cost['tiled_detections']} vs "
+              f"{cost['single_pass_detections']} detections)")
+    else:
+        print(f"Running detection with confidence threshold: {conf}")
+        results = model(image, conf=conf)
+        detections = dets.from_result(results[0])
+    loader.report_first_detection()
     
     # Count detections by class
-    class_counts = {}
-    total_detections = 0
-    
-    if len(result.boxes) > 0:
-        for box in result.boxes:
-            cls_id = int(box.cls[0])
-            class_name = model.names[cls_id]
-            confidence = float(box.conf[0])
-            
-            # Count by class
-            if class_name not in class_counts:
-                class_counts[class_name] = 0
-            class_counts[class_name] += 1
-            total_detections += 1
-            
-            # Print detection info
-            print(f"  - {class_name}: {confidence:.2%} confidence")
+    class_counts = dets.count_classes(detections, model.names)
+    total_detections = len(detections)
+    
+    for detail in dets.detection_details(detections, model.names):
+        # Print detection info
+        print(f"  - {detail['class']}: {detail['confidence']:.2%} confidence")
     
     # Print summary
     print(f"\n{'='*50}")
@@ -73,7 +83,7 @@ def detect_in_image(image_path, model_path='runs/detect/betty_haagen3/weights/be
         print("  - Try lowering confidence threshold")
     
     # Draw results on image
-    annotated_image = result.plot()
+    annotated_image = dets.draw_detections(image, detections, model.names)
     
     # Save the result
     output_path = image_path.rsplit('.', 1)[0] + '_detected.' + image_path.rsplit('.', 1)[1]
@@ -87,12 +97,178 @@ def detect_in_image(image_path, model_path='runs/detect/betty_haagen3/weights/be
     cv2.destroyAllWindows()
 
 
+def collect_images(inputs):
+    """Expand directories, glob patterns and .txt file lists into image paths"""
+    images = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            images.extend(sorted(p for p in path.rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS))
+        elif any(ch in item for ch in '*?['):
+            images.extend(Path(p) for p in sorted(glob.glob(item, recursive=True)))
+        elif path.suffix.lower() == '.txt':
+            with open(path) as f:
+                images.extend(Path(line.strip()) for line in f if line.strip())
+        else:
+            images.append(path)
+    return [str(p) for p in images]
+
+
+def load_processed(output_path):
+    """Image paths already written to a previous (possibly interrupted) run"""
+    processed = set()
+    if not os.path.exists(output_path):
+        return processed
+    with open(output_path, newline='') as f:
+        if output_path.endswith('.csv'):
+            for row in csv.DictReader(f):
+                processed.add(row['image'])
+        else:
+            for line in f:
+                try:
+                    processed.add(json.loads(line)['image'])
+                except (json.JSONDecodeError, KeyError):
+                    continue  # partial last line from an interrupted run
+    return processed
+
+
+def decode_ahead(image_paths, workers, prefetch):
+    """Yield (path, image) in order while a thread pool decodes the next images"""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        paths = iter(image_paths)
+        for path in paths:
+            pending.append((path, executor.submit(cv2.imread, path)))
+            if len(pending) >= prefetch:
+                break
+        while pending:
+            path, future = pending.pop(0)
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append((next_path, executor.submit(cv2.imread, next_path)))
+            yield path, future.result()
+
+
+def detect_batch(inputs, output_path, model_path=DEFAULT_MODEL, conf=0.25,
+                 batch_size=16, decode_workers=4, tiled=False, cache_export=False):
+    """
+    Headless batch detection over many images
+
+    The model is loaded once, images are decoded on a thread pool ahead of
+    inference and run through the model in batches. Per-image counts are
+    appended to a JSONL or CSV file as each batch finishes, and images
+    already in that file are skipped, so an interrupted run resumes.
+    With tiled, each image is sliced and its tiles form the batch instead.
+    The model loads in the background while inputs and the previous output
+    are scanned; cache_export exports a .pt-only model for faster next runs.
+    """
+    loader = start_model_loader(model_path, cache_export=cache_export)
+    image_paths = collect_images(inputs)
+    processed = load_processed(output_path)
+    todo = [p for p in image_paths if p not in processed]
+    print(f"Found {len(image_paths)} images, {len(image_paths) - len(todo)} already processed")
+    if not todo:
+        return
+
+    model = loader.wait()
+    class_names = [model.names[i] for i in sorted(model.names)]
+    is_csv = output_path.endswith('.csv')
+    write_header = is_csv and not os.path.exists(output_path)
+
+    totals = {}
+    done = 0
+    start = time.perf_counter()
+    with open(output_path, 'a', newline='') as out:
+        writer = None
+        if is_csv:
+            writer = csv.DictWriter(out, fieldnames=['image', 'total', *class_names, 'error'], restval=0)
+            if write_header:
+                writer.writeheader()
+
+        def write_record(record):
+            if writer:
+                writer.writerow({'image': record['image'], 'total': record['total'],
+                                 **record['class_counts'], 'error': record.get('error', '')})
+            else:
+                out.write(json.dumps(record) + '\n')
+
+        def flush(batch):
+            nonlocal done
+            if tiled:
+                all_detections = [detect_tiled(model, image, conf=conf)[0] for _, image in batch]
+            else:
+                results = model([image for _, image in batch], conf=conf, verbose=False)
+                all_detections = [dets.from_result(result) for result in results]
+            loader.report_first_detection()
+            for (path, _), detections in zip(batch, all_detections):
+                class_counts = dets.count_classes(detections, model.names)
+                for name, count in class_counts.items():
+                    totals[name] = totals.get(name, 0) + count
+                write_record({'image': path, 'total': len(detections), 'class_counts': class_counts})
+            out.flush()
+            done += len(batch)
+            rate = done / (time.perf_counter() - start)
+            print(f"Processed {done}/{len(todo)} images ({rate:.1f} img/s)")
+
+        batch = []
+        for path, image in decode_ahead(todo, decode_workers, prefetch=batch_size * 2):
+            if image is None:
+                write_record({'image': path, 'total': 0, 'class_counts': {}, 'error': 'could not read image'})
+                continue
+            batch.append((path, image))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+
+    print(f"\n{'='*50}")
+    print("Batch Summary:")
+    print(f"{'='*50}")
+    print(f"Images processed: {done}")
+    for class_name, count in totals.items():
+        print(f"  {class_name}: {count}")
+    print(f"Results written to: {output_path}")
+
+
+def main_batch(argv):
+    parser = argparse.ArgumentParser(
+        prog="detect_from_image.py --batch",
+        description="Headless batch detection with streamed, resumable per-image counts"
+    )
+    parser.add_argument('inputs', nargs='+', help="Image files, directories, glob patterns or .txt file lists")
+    parser.add_argument('-o', '--output', default='detections.jsonl', help="Output .jsonl or .csv file")
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--decode-workers', type=int, default=4)
+    parser.add_argument('--tiled', action='store_true', help="Sliced inference for high-resolution images")
+    parser.add_argument('--cache-export', action='store_true',
+                        help="Export a .pt-only model to ONNX/OpenVINO after loading so later runs start faster")
+    args = parser.parse_args(argv)
+    detect_batch(args.inputs, args.output, model_path=args.model, conf=args.conf,
+                 batch_size=args.batch_size, decode_workers=args.decode_workers, tiled=args.tiled,
+                 cache_export=args.cache_export)
+
+
 if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == '--batch':
+        main_batch(sys.argv[2:])
+        sys.exit(0)
+
+    # Optional sliced inference for large shelf panoramas
+    tiled = '--tiled' in sys.argv
+    if tiled:
+        sys.argv.remove('--tiled')
+    
     if len(sys.argv) < 2:
-        print("Usage: python detect_from_image.py <image_path> [confidence_threshold]")
+        print("Usage: python detect_from_image.py <image_path> [confidence_threshold] [--tiled]")
+        print("       python detect_from_image.py --batch <dir|glob|list.txt>... [-o counts.jsonl|counts.csv]")
         print("\nExample:")
         print("  python detect_from_image.py my_image.jpg")
         print("  python detect_from_image.py my_image.jpg 0.3")
+        print("  python detect_from_image.py shelf_panorama.jpg 0.3 --tiled")
+        print("  python detect_from_image.py --batch shelf_photos/ -o counts.csv --conf 0.3")
         print("\nSupported formats: .jpg, .jpeg, .png, .bmp, etc.")
         sys.exit(1)
     
@@ -109,4 +285,4 @@ if __name__ == "__main__":
         except ValueError:
             print("Warning: Invalid confidence value. Using default 0.25")
     
-    detect_in_image(image_path, conf=conf)
+    detect_in_image(image_path, conf=conf, tiled=tiled)
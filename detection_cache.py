@@ -0,0 +1,85 @@
+"""
+Content-hash result cache for repeated images
+Stores raw detections taken at a low confidence floor so that any higher
+threshold can be answered by filtering instead of re-running the model
+"""
+import hashlib
+from collections import OrderedDict
+from typing import NamedTuple
+
+# Inference runs at this threshold whenever the result is going to be cached
+CACHE_FLOOR = 0.05
+
+# Rough bookkeeping cost of one entry on top of its detections array
+ENTRY_OVERHEAD_BYTES = 512
+
+
+def content_hash(data):
+    """Hash raw image bytes (or an image array) into a cache key"""
+    if hasattr(data, "tobytes"):
+        data = data.tobytes()
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class CachedDetections(NamedTuple):
+    detections: object  # (N, 6) float32 array, see detections.py
+    floor: float        # confidence the detections were taken at
+    names: dict         # class id -> name for the model that produced them
+
+
+class DetectionCache:
+    """Bounded LRU cache keyed by image content hash plus model version"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, model_version, confidence):
+        """Return cached detections usable at this confidence, or None"""
+        entry = self._entries.get((key, model_version))
+        if entry is None or confidence < entry.floor:
+            self.misses += 1
+            return None
+        self._entries.move_to_end((key, model_version))
+        self.hits += 1
+        return entry
+
+    def put(self, key, model_version, detections, floor, names):
+        cache_key = (key, model_version)
+        if cache_key in self._entries:
+            self._discard(cache_key)
+
+        entry = CachedDetections(detections, floor, names)
+        self._entries[cache_key] = entry
+        self.size_bytes += self._entry_size(entry)
+
+        while self.size_bytes > self.max_bytes and len(self._entries) > 1:
+            self._discard(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def _discard(self, cache_key):
+        self.size_bytes -= self._entry_size(self._entries.pop(cache_key))
+
+    @staticmethod
+    def _entry_size(entry):
+        return entry.detections.nbytes + ENTRY_OVERHEAD_BYTES
@@ -0,0 +1,81 @@
+"""
+Helpers for raw YOLO detections held as plain NumPy arrays
+Shared by the GUI, the CLI tools and the backend API
+
+Every detections array has shape (N, 6) and BOX_LAYOUT columns, in pixel
+coordinates of the original image.
+"""
+import numpy as np
+
+BOX_LAYOUT = "x1,y1,x2,y2,confidence,class_id"
+
+
+def from_result(result):
+    """Extract an (N, 6) float32 detections array from a YOLO result"""
+    boxes = result.boxes
+    if len(boxes) == 0:
+        return np.zeros((0, 6), dtype=np.float32)
+    return np.concatenate([
+        boxes.xyxy.cpu().numpy(),
+        boxes.conf.cpu().numpy()[:, None],
+        boxes.cls.cpu().numpy()[:, None],
+    ], axis=1).astype(np.float32)
+
+
+def filter_confidence(detections, conf):
+    """Keep only detections at or above the confidence threshold"""
+    return detections[detections[:, 4] >= conf]
+
+
+def count_classes(detections, names):
+    """Count detections per class name, in order of first appearance"""
+    class_counts = {}
+    for cls_id in detections[:, 5].astype(int):
+        class_name = names[cls_id]
+        class_counts[class_name] = class_counts.get(class_name, 0) + 1
+    return class_counts
+
+
+def detection_details(detections, names):
+    """Per-box class, confidence and rounded xyxy box"""
+    return [
+        {
+            "class": names[int(cls_id)],
+            "confidence": float(conf),
+            "box": [round(float(v), 1) for v in (x1, y1, x2, y2)]
+        }
+        for x1, y1, x2, y2, conf, cls_id in detections
+    ]
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU between two (N, 4) and (M, 4) xyxy arrays"""
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def draw_detections(image, detections, names):
+    """Draw boxes and labels on a copy of the image, matching result.plot()"""
+    from ultralytics.utils.plotting import Annotator, colors
+
+    annotator = Annotator(image.copy(), example=str(names))
+    for x1, y1, x2, y2, conf, cls_id in detections:
+        cls_id = int(cls_id)
+        annotator.box_label(
+            (x1, y1, x2, y2), f"{names[cls_id]} {conf:.2f}", color=colors(cls_id, True)
+        )
+    return annotator.result()
+
+
+def scale_boxes(detections, sx, sy):
+    """Copy of detections with box coordinates multiplied by (sx, sy), e.g. back to original pixels"""
+    scaled = detections.copy()
+    scaled[:, [0, 2]] *= sx
+    scaled[:, [1, 3]] *= sy
+    return scaled
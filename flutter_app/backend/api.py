@@ -2,17 +2,165 @@
 FastAPI backend for ProDetect Flutter app
 Handles YOLO model inference
 """
-from fastapi import FastAPI, File, UploadFile, Form
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import FastAPI, File, UploadFile, Form, Header, WebSocket
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from ultralytics import YOLO
+from contextlib import asynccontextmanager
+from typing import List
+import asyncio
+import json
+import zipfile
 import cv2
-import numpy as np
-from PIL import Image
-import io
+import os
+import sys
+import time
 import base64
+import hmac
+from pathlib import Path
 
-app = FastAPI(title="ProDetect API")
+from batcher import MemoryBudget, MemoryBudgetExceeded, MicroBatcher, QueueFullError
+from metrics import Counter, Gauge, Histogram, Registry
+from model_versions import ModelVersions
+from worker import ANNOTATE_MODES, DetectionJob, InferencePool, decode_plan, run_detection_batch
+
+# Shared detection helpers live at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+import detections as dets
+from detection_cache import CACHE_FLOOR, DetectionCache, content_hash
+from model_loader import load_registry
+
+try:
+    import msgpack
+except ImportError:  # optional, only needed for format=msgpack
+    msgpack = None
+
+# Reference point for the startup and time-to-first-detection metrics
+PROCESS_START = time.perf_counter()
+
+RESPONSE_FORMATS = ("json", "msgpack", "packed")
+
+def load_models():
+    """Named models from models.json; PRODETECT_MODEL overrides the default's checkpoint"""
+    models, default = load_registry()
+    if "PRODETECT_MODEL" in os.environ:
+        models[default] = Path(os.environ["PRODETECT_MODEL"])
+    return models, default
+
+# All preloaded at startup
+MODELS, DEFAULT_MODEL = load_models()
+# auto picks the fastest exported runtime (OpenVINO, ONNX) next to the checkpoint
+MODEL_RUNTIME = os.environ.get("PRODETECT_RUNTIME", "auto")
+# Required as X-Admin-Token on model reloads; reloads are disabled when unset
+ADMIN_TOKEN = os.environ.get("PRODETECT_ADMIN_TOKEN")
+
+# Micro-batching settings (tune against p99 latency with /stats)
+MAX_BATCH_SIZE = int(os.environ.get("PRODETECT_MAX_BATCH_SIZE", 8))
+MAX_WAIT_MS = float(os.environ.get("PRODETECT_MAX_WAIT_MS", 10))
+
+# Worker tier: each process holds its own model and a share of the cores
+NUM_WORKERS = int(os.environ.get("PRODETECT_WORKERS", 2))
+MAX_PENDING = int(os.environ.get("PRODETECT_MAX_PENDING", NUM_WORKERS * MAX_BATCH_SIZE * 4))
+RETRY_AFTER_SECONDS = int(os.environ.get("PRODETECT_RETRY_AFTER", 1))
+
+# /detect/batch: images in flight per bulk request (enough to fill every
+# worker's batch)
+BULK_CONCURRENCY = int(os.environ.get("PRODETECT_BULK_CONCURRENCY", NUM_WORKERS * MAX_BATCH_SIZE))
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp'}
+
+# Upload size limit (413 beyond it) and the memory budget for images being
+# processed; requests that would exceed the budget get 503 with Retry-After
+MAX_IMAGE_MB = float(os.environ.get("PRODETECT_MAX_IMAGE_MB", 50))
+MEMORY_BUDGET_MB = float(os.environ.get("PRODETECT_MEMORY_BUDGET_MB", 1024))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+memory_budget = MemoryBudget(int(MEMORY_BUDGET_MB * 1024 * 1024))
+
+
+class UploadTooLarge(ValueError):
+    """Raised by read_upload for uploads over MAX_IMAGE_MB"""
+
+# Result cache for re-submitted images (raw detections only, no pixels)
+CACHE_MAX_MB = float(os.environ.get("PRODETECT_CACHE_MB", 64))
+cache = DetectionCache(max_bytes=int(CACHE_MAX_MB * 1024 * 1024))
+
+pool = InferencePool(num_workers=NUM_WORKERS)
+versions = ModelVersions(pool, runtime=MODEL_RUNTIME)
+
+# Prometheus metrics served at /metrics; stage timings come back from the workers
+registry = Registry()
+request_seconds = registry.register(Histogram(
+    "prodetect_request_seconds", "Server-side request latency", ["endpoint"]))
+stage_seconds = registry.register(Histogram(
+    "prodetect_stage_seconds", "Time per processing stage (model is the batched forward pass)", ["stage"]))
+queue_wait_seconds = registry.register(Histogram(
+    "prodetect_queue_wait_seconds", "Time requests wait in the micro-batching queue"))
+requests_total = registry.register(Counter(
+    "prodetect_requests_total", "Requests by endpoint and outcome", ["endpoint", "outcome"]))
+detections_total = registry.register(Counter(
+    "prodetect_detections_total", "Detections returned per class", ["class"]))
+requests_in_flight = registry.register(Gauge(
+    "prodetect_requests_in_flight", "Requests currently being handled"))
+model_load_seconds = registry.register(Gauge(
+    "prodetect_model_load_seconds", "Model load and warm-up time per inference worker", ["model", "worker"]))
+startup_seconds = registry.register(Gauge(
+    "prodetect_startup_seconds", "Time from process start until every model was loaded and warm"))
+first_detection_seconds = registry.register(Gauge(
+    "prodetect_first_detection_seconds", "Time from process start until the first detection was returned"))
+
+# One batch in flight per worker; decode, inference and encoding all happen
+# in the workers so this process only does I/O and dispatch
+batcher = MicroBatcher(
+    run_detection_batch,
+    max_batch_size=MAX_BATCH_SIZE,
+    max_wait_ms=MAX_WAIT_MS,
+    max_concurrent_batches=NUM_WORKERS,
+    max_pending=MAX_PENDING,
+    wait_histogram=queue_wait_seconds,
+)
+registry.register(Gauge(
+    "prodetect_queue_depth", "Requests waiting for a batch", callback=lambda: batcher.metrics.queue_depth))
+registry.register(Counter(
+    "prodetect_rejected_total", "Requests rejected with 503", callback=lambda: batcher.metrics.rejected))
+registry.register(Gauge(
+    "prodetect_memory_reserved_bytes", "Estimated memory of images being processed",
+    callback=lambda: memory_budget.reserved))
+registry.register(Counter(
+    "prodetect_memory_rejected_total", "Requests refused by the memory budget",
+    callback=lambda: memory_budget.rejected))
+registry.register(Counter(
+    "prodetect_cache_hits_total", "Result cache hits", callback=lambda: cache.hits))
+registry.register(Counter(
+    "prodetect_cache_misses_total", "Result cache misses", callback=lambda: cache.misses))
+
+
+async def activate_model(name, weights_path, rolling=True):
+    """Load (if needed), warm and swap in a model version under name"""
+    version, load_seconds = await versions.load(name, weights_path, rolling)
+    for worker_pid, seconds in load_seconds.items():
+        model_load_seconds.set(seconds, name, worker_pid)
+    return version, load_seconds
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await pool.start()
+    for name, weights_path in MODELS.items():
+        try:
+            # Nothing is serving yet, so every worker can load at once
+            await activate_model(name, weights_path, rolling=False)
+        except Exception as e:
+            if name == DEFAULT_MODEL:
+                raise
+            print(f"⚠️ Skipping model {name} ({weights_path}): {e}")
+    startup_seconds.set(time.perf_counter() - PROCESS_START)
+    print(f"⏱ Ready to serve after {time.perf_counter() - PROCESS_START:.2f}s")
+    batcher.executor = pool
+    await batcher.start()
+    yield
+    await batcher.stop()
+    pool.shutdown()
+
+
+app = FastAPI(title="ProDetect API", lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -23,69 +171,573 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load model
-model = YOLO('../../runs/detect/poc_final_training/weights/best.pt')
-
 @app.get("/")
 def root():
     return {"message": "ProDetect API is running"}
 
+@app.get("/stats")
+def stats():
+    """Batching queue, result cache and memory budget metrics"""
+    return {"batching": batcher.metrics.snapshot(), "cache": cache.stats(), "memory": memory_budget.snapshot()}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text exposition (async so it renders on the same thread that updates)"""
+    return Response(content=registry.render(), media_type=registry.content_type)
+
+@app.get("/models")
+def list_models():
+    """Loaded model names, the version each one serves and its in-flight requests"""
+    return {"default": DEFAULT_MODEL, "models": versions.snapshot()}
+
+@app.post("/models/{name}/reload")
+async def reload_model(name: str, x_admin_token: str = Header(None)):
+    """
+    Load a new version of a model and swap it in without dropping requests
+
+    The checkpoint is the name's entry in models.json (re-read, so edits
+    to the registry take effect), or PRODETECT_MODEL for the default model,
+    as at startup; arbitrary paths are never loaded, since loading a
+    checkpoint unpickles it. Disabled unless PRODETECT_ADMIN_TOKEN
+    is set. Requests already running finish on the old version, which is
+    unloaded afterwards.
+    """
+    if not ADMIN_TOKEN:
+        return JSONResponse(status_code=403, content={
+            "success": False, "error": "Model reload is disabled; set PRODETECT_ADMIN_TOKEN to enable it"
+        })
+    if not hmac.compare_digest((x_admin_token or "").encode(), ADMIN_TOKEN.encode()):
+        return JSONResponse(status_code=403, content={"success": False, "error": "Invalid admin token"})
+    registry_models = load_models()[0]
+    if name not in registry_models:
+        return JSONResponse(status_code=404, content={"success": False, "error": f"Unknown model {name}"})
+    path = registry_models[name]
+    try:
+        version, load_seconds = await activate_model(name, path)
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
+    return {"success": True, "model": name, "version": version,
+            "load_seconds": max(load_seconds.values(), default=0.0)}
+
+def upload_size(upload):
+    """Size of a spooled upload without reading it"""
+    size = getattr(upload, "size", None)
+    if size is None:
+        upload.file.seek(0, os.SEEK_END)
+        size = upload.file.tell()
+        upload.file.seek(0)
+    return size
+
+async def read_upload(upload, max_bytes):
+    """
+    Read an upload into one preallocated buffer, chunk by chunk
+
+    Returns (contents, reservation). The upload's size is reserved in the
+    memory budget before anything is read, and the caller keeps (and
+    finally releases) that reservation for the rest of the request. Peak
+    memory is the image plus one chunk, and nothing is read at all when the
+    upload is over max_bytes (UploadTooLarge) or does not fit the memory
+    budget right now (MemoryBudgetExceeded).
+    """
+    size = upload_size(upload)
+    if size > max_bytes:
+        raise UploadTooLarge(f"Image larger than {max_bytes / 1024 ** 2:g} MB")
+    reservation = memory_budget.reserve(size)
+    try:
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        position = 0
+        while position < size:
+            chunk = await upload.read(min(UPLOAD_CHUNK_BYTES, size - position))
+            if not chunk:
+                break
+            view[position:position + len(chunk)] = chunk
+            position += len(chunk)
+    except BaseException:
+        reservation.release()
+        raise
+    return (buffer if position == size else buffer[:position]), reservation
+
+def estimate_request_bytes(contents, annotate, tiled):
+    """Memory an image needs while in the worker tier: upload copies plus decoded (and annotated) pixels"""
+    _, factor, header = decode_plan(contents, reduce=not tiled)
+    if header is None:
+        decoded = len(contents) * 10  # unknown format: assume typical JPEG compression
+    else:
+        decoded = -(-header[1] // factor) * -(-header[2] // factor) * 3
+    # The upload is also copied into the worker; annotating adds a second image
+    return 2 * len(contents) + decoded * (1 if annotate == "none" else 2)
+
+def record_request(endpoint, outcome, start):
+    requests_total.inc(endpoint, outcome)
+    request_seconds.observe(time.perf_counter() - start, endpoint)
+
+async def run_detection(contents, confidence, annotate="full", use_cache=True, tiled=False, model=None,
+                        reservation=None):
+    """
+    Detect products in raw image bytes, answering from the cache when possible
+
+    Returns (detections, names, annotated_jpeg) with detections already
+    filtered to the requested confidence. tiled runs sliced inference for
+    high-resolution images and is cached separately from single-pass results.
+    model is a registry name (default: the registry default); the version it
+    points to is pinned for the whole request, even across a reload.
+    reservation is the caller's memory budget reservation for contents
+    (from read_upload); it is grown to the full estimate before inference
+    and released by the caller. Without one, the estimate is reserved just
+    around inference.
+    """
+    version = versions.acquire(model or DEFAULT_MODEL)
+    try:
+        return await detect_with_version(contents, confidence, annotate, use_cache, tiled, version, reservation)
+    finally:
+        versions.release(version)
+
+async def detect_with_version(contents, confidence, annotate, use_cache, tiled, version, reservation=None):
+    entry = None
+    model_version = f"{version}:tiled" if tiled else version
+    if use_cache:
+        key = content_hash(contents)
+        entry = cache.get(key, model_version, confidence)
+
+    if entry is not None and annotate == "none":
+        detections, names, annotated_image = entry.detections, entry.names, None
+    else:
+        # Misses run at the cache floor so later thresholds can be filtered;
+        # hits that need an annotated image only decode and draw
+        job = DetectionJob(
+            contents, confidence, annotate,
+            infer_conf=min(confidence, CACHE_FLOOR) if use_cache else confidence,
+            detections=entry.detections if entry else None,
+            tiled=tiled,
+            model_version=version
+        )
+        own_reservation = reservation is None
+        if own_reservation:
+            reservation = memory_budget.reserve(0)
+        try:
+            reservation.grow_to(estimate_request_bytes(contents, annotate, tiled))
+            result = await batcher.submit(job)
+        finally:
+            if own_reservation:
+                reservation.release()
+        for stage, seconds in result["timings"].items():
+            stage_seconds.observe(seconds, stage)
+        detections, names = result["detections"], result["names"]
+        annotated_image = result["annotated_image"]
+        if use_cache and entry is None:
+            cache.put(key, model_version, detections, result["floor"], names)
+
+    if not first_detection_seconds.values:
+        first_detection_seconds.set(time.perf_counter() - PROCESS_START)
+    detections = dets.filter_confidence(detections, confidence)
+    for class_name, count in dets.count_classes(detections, names).items():
+        detections_total.inc(class_name, amount=count)
+    return detections, names, annotated_image
+
+def json_payload(detections, names, annotated_image=None):
+    """Build the /detect JSON response"""
+    response = {
+        "success": True,
+        "total_detections": len(detections),
+        "class_counts": dets.count_classes(detections, names),
+        "detection_details": dets.detection_details(detections, names)
+    }
+    if annotated_image is not None:
+        start = time.perf_counter()
+        response["annotated_image"] = base64.b64encode(annotated_image).decode('utf-8')
+        stage_seconds.observe(time.perf_counter() - start, "base64")
+    return response
+
+def binary_response(detections, names, annotated_image, output_format):
+    """Encode detections as msgpack or a packed float32 box array"""
+    class_names = [names[i] for i in sorted(names)]
+    if output_format == "packed":
+        return Response(
+            content=detections.tobytes(),
+            media_type="application/octet-stream",
+            headers={
+                "X-Total-Detections": str(len(detections)),
+                "X-Box-Layout": dets.BOX_LAYOUT,
+                "X-Class-Names": json.dumps(class_names),
+            }
+        )
+
+    payload = {
+        "success": True,
+        "total_detections": len(detections),
+        "class_counts": dets.count_classes(detections, names),
+        "class_names": class_names,
+        "box_layout": dets.BOX_LAYOUT,
+        "boxes": detections.tobytes()
+    }
+    if annotated_image is not None:
+        payload["annotated_image"] = annotated_image
+    return Response(content=msgpack.packb(payload), media_type="application/x-msgpack")
+
 @app.post("/detect")
 async def detect_products(
     file: UploadFile = File(...),
-    confidence: float = Form(0.25)
+    confidence: float = Form(0.25),
+    annotate: str = Form("full"),
+    output_format: str = Form("json", alias="format"),
+    tiled: bool = Form(False),
+    model: str = Form(None)
 ):
-    """Detect products in uploaded image"""
+    """
+    Detect products in uploaded image
+
+    annotate: "full" (default), "thumbnail" or "none" to skip plotting/encoding
+    format: "json" (default), "msgpack" or "packed" (raw float32 boxes in
+    X-Box-Layout order; the annotated image is never included)
+    tiled: slice large images into overlapping tiles before detecting
+    model: registry name of the model to use (see /models)
+    """
+    start = time.perf_counter()
+    if model is not None and model not in versions.active:
+        record_request("detect", "bad_request", start)
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "error": f"Unknown model {model}, loaded: {sorted(versions.active)}"}
+        )
+    if annotate not in ANNOTATE_MODES or output_format not in RESPONSE_FORMATS:
+        record_request("detect", "bad_request", start)
+        return JSONResponse(
+            status_code=400,
+            content={"success": False,
+                     "error": f"annotate must be one of {ANNOTATE_MODES} and format one of {RESPONSE_FORMATS}"}
+        )
+    if output_format == "msgpack" and msgpack is None:
+        record_request("detect", "bad_request", start)
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "error": "msgpack is not installed on the server"}
+        )
+    if output_format == "packed":
+        annotate = "none"
+
+    requests_in_flight.inc()
     try:
-        # Read image
-        contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        # Run detection
-        results = model(image, conf=confidence)
-        result = results[0]
-        
-        # Count detections
-        total_detections = len(result.boxes)
-        class_counts = {}
-        detection_details = []
-        
-        if len(result.boxes) > 0:
-            for box in result.boxes:
-                cls_id = int(box.cls[0])
-                class_name = model.names[cls_id]
-                conf = float(box.conf[0])
-                
-                if class_name not in class_counts:
-                    class_counts[class_name] = 0
-                class_counts[class_name] += 1
-                
-                detection_details.append({
-                    "class": class_name,
-                    "confidence": conf
-                })
-        
-        # Get annotated image
-        annotated_image = result.plot()
-        
-        # Convert to base64
-        _, buffer = cv2.imencode('.jpg', annotated_image)
-        img_base64 = base64.b64encode(buffer).decode('utf-8')
-        
-        return {
-            "success": True,
-            "total_detections": total_detections,
-            "class_counts": class_counts,
-            "detection_details": detection_details,
-            "annotated_image": img_base64
-        }
-        
+        # Read image (bounded by the size limit and the memory budget)
+        contents, reservation = await read_upload(file, MAX_IMAGE_MB * 1024 * 1024)
+
+        # Decode and detect in a worker as part of the next batch
+        with reservation:
+            detections, names, annotated_image = await run_detection(
+                contents, confidence, annotate, tiled=tiled, model=model, reservation=reservation
+            )
+        if output_format == "json":
+            response = json_payload(detections, names, annotated_image)
+        else:
+            response = binary_response(detections, names, annotated_image, output_format)
+        record_request("detect", "ok", start)
+        return response
+
+    except UploadTooLarge as e:
+        record_request("detect", "too_large", start)
+        return JSONResponse(status_code=413, content={"success": False, "error": str(e)})
+    except QueueFullError:
+        record_request("detect", "busy", start)
+        return JSONResponse(
+            status_code=503,
+            content={"success": False, "error": "Server busy, please retry"},
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
     except Exception as e:
+        record_request("detect", "error", start)
         return JSONResponse(
             status_code=500,
             content={"success": False, "error": str(e)}
         )
+    finally:
+        requests_in_flight.dec()
+
+def open_archive(upload):
+    """
+    Open an uploaded zip and list its image entries
+
+    Returns (archive, [ZipInfo]); entries are read one at a time by the
+    caller once their size fits the memory budget, so only the images
+    currently being processed are held in memory.
+    """
+    archive = zipfile.ZipFile(upload.file)
+    entries = [
+        info for info in archive.infolist()
+        if not info.is_dir() and Path(info.filename).suffix.lower() in IMAGE_EXTENSIONS
+    ]
+    return archive, entries
+
+def is_archive(upload):
+    return upload.filename.lower().endswith(".zip") or upload.content_type in (
+        "application/zip", "application/x-zip-compressed"
+    )
+
+async def detect_until_admitted(contents, confidence, annotate, tiled, model, reservation):
+    """run_detection for bulk uploads: wait and retry instead of failing when the queue is full"""
+    while True:
+        try:
+            return await run_detection(contents, confidence, annotate, tiled=tiled, model=model,
+                                       reservation=reservation)
+        except QueueFullError:
+            await asyncio.sleep(RETRY_AFTER_SECONDS)
+
+async def until_admitted(fn, *args):
+    """Call fn(*args) (sync or async) until it fits the memory budget"""
+    while True:
+        try:
+            result = fn(*args)
+            return await result if asyncio.iscoroutine(result) else result
+        except MemoryBudgetExceeded:
+            await asyncio.sleep(RETRY_AFTER_SECONDS)
+
+@app.post("/detect/batch")
+async def detect_batch(
+    files: List[UploadFile] = File(...),
+    confidence: float = Form(0.25),
+    annotate: str = Form("none"),
+    tiled: bool = Form(False),
+    model: str = Form(None)
+):
+    """
+    Detect products in many images (files and/or zip archives) in one request
+
+    Streams NDJSON: one line per image as soon as it is done (in completion
+    order, with its upload index and name), then a final {"summary": true}
+    line with per-class totals for the whole upload. An upload that cannot
+    be opened at all (e.g. a corrupt zip) gets one error line with its
+    "upload" name and no index, counted in failed_uploads, not images. Images go through the
+    shared micro-batcher, so they are decoded in parallel by the workers and
+    inferred in model-sized batches. annotate defaults to "none".
+    """
+    start = time.perf_counter()
+    if annotate not in ANNOTATE_MODES or (model is not None and model not in versions.active):
+        record_request("detect_batch", "bad_request", start)
+        return JSONResponse(
+            status_code=400,
+            content={"success": False,
+                     "error": f"annotate must be one of {ANNOTATE_MODES} and model one of {sorted(versions.active)}"}
+        )
+
+    loop = asyncio.get_running_loop()
+    lines = asyncio.Queue()
+    slots = asyncio.Semaphore(BULK_CONCURRENCY)
+    tasks = []
+    # A task cancelled before it starts never runs its finally, so the
+    # stream releases these itself when it is torn down
+    reservations = []
+
+    async def detect_one(index, name, contents, reservation=None):
+        try:
+            if isinstance(contents, str):
+                raise ValueError(contents)
+            detections, names, annotated_image = await detect_until_admitted(
+                contents, confidence, annotate, tiled, model, reservation
+            )
+            line = {"index": index, "image": name, **json_payload(detections, names, annotated_image)}
+        except Exception as e:
+            line = {"index": index, "image": name, "success": False, "error": str(e)}
+        finally:
+            if reservation is not None:
+                reservation.release()
+            slots.release()
+        await lines.put(line)
+
+    async def read_entry(archive, info):
+        """(bytes or error message, reservation) for one zip entry, within the memory budget"""
+        if info.file_size > MAX_IMAGE_MB * 1024 * 1024:
+            return f"Image larger than {MAX_IMAGE_MB:g} MB", None
+        # file_size is also the most a zip entry can decompress to
+        reservation = await until_admitted(memory_budget.reserve, info.file_size)
+        try:
+            # Zip reads are blocking file I/O, keep them off the event loop
+            return await loop.run_in_executor(None, archive.read, info), reservation
+        except Exception as e:
+            reservation.release()
+            return f"Could not read {info.filename}: {e}", None
+        except BaseException:
+            reservation.release()
+            raise
+
+    async def submit_all():
+        for upload in files:
+            try:
+                if is_archive(upload):
+                    archive, entries = await loop.run_in_executor(None, open_archive, upload)
+                    with archive:
+                        for info in entries:
+                            await slots.acquire()
+                            contents, reservation = await read_entry(archive, info)
+                            reservations.append(reservation)
+                            tasks.append(asyncio.create_task(
+                                detect_one(len(tasks), info.filename, contents, reservation)
+                            ))
+                else:
+                    await slots.acquire()
+                    reservation = None
+                    try:
+                        contents, reservation = await until_admitted(
+                            read_upload, upload, MAX_IMAGE_MB * 1024 * 1024
+                        )
+                    except UploadTooLarge as e:
+                        contents = str(e)
+                    except Exception:
+                        slots.release()
+                        raise
+                    reservations.append(reservation)
+                    tasks.append(asyncio.create_task(
+                        detect_one(len(tasks), upload.filename, contents, reservation)
+                    ))
+            except Exception as e:
+                await lines.put({"upload": upload.filename, "success": False,
+                                 "error": f"Could not read upload: {e}"})
+        await asyncio.gather(*tasks)
+        await lines.put(None)
+
+    async def stream():
+        requests_in_flight.inc()
+        producer = asyncio.create_task(submit_all())
+        totals = {}
+        images = failed = failed_uploads = 0
+        try:
+            while (line := await lines.get()) is not None:
+                if "upload" in line:
+                    failed_uploads += 1
+                    yield json.dumps(line) + "\n"
+                    continue
+                images += 1
+                if line["success"]:
+                    for class_name, count in line["class_counts"].items():
+                        totals[class_name] = totals.get(class_name, 0) + count
+                else:
+                    failed += 1
+                yield json.dumps(line) + "\n"
+            yield json.dumps({
+                "summary": True,
+                "images": images,
+                "failed": failed,
+                "failed_uploads": failed_uploads,
+                "total_detections": sum(totals.values()),
+                "class_totals": totals,
+                "elapsed_ms": (time.perf_counter() - start) * 1000,
+            }) + "\n"
+            record_request("detect_batch", "ok", start)
+        finally:
+            # Also runs when the client disconnects mid-stream
+            producer.cancel()
+            for task in tasks:
+                task.cancel()
+            for reservation in reservations:
+                if reservation is not None:
+                    reservation.release()
+            requests_in_flight.dec()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.websocket("/ws/detect")
+async def detect_stream(websocket: WebSocket):
+    """
+    Stream detections for a continuous sequence of frames
+
+    The client sends each frame as a binary JPEG message and may send a
+    text message like {"confidence": 0.3, "model": "poc"} at any time
+    (both can also be given as query parameters). Every reply holds
+    only box/class/confidence records for the newest frame; frames that
+    arrive while the previous one is still being processed replace it
+    and are counted as dropped, so the stream never falls behind. Frames
+    follow the same PRODETECT_MAX_IMAGE_MB limit and memory budget as
+    /detect; a frame that does not fit the budget is dropped.
+    """
+    await websocket.accept()
+    try:
+        confidence = float(websocket.query_params.get("confidence", 0.25))
+    except ValueError as e:
+        await websocket.send_json({"success": False, "error": f"Invalid confidence: {e}"})
+        await websocket.close(code=1008)
+        return
+    model = websocket.query_params.get("model")
+    if model is not None and model not in versions.active:
+        await websocket.send_json({"success": False, "error": f"Unknown model {model}, loaded: {sorted(versions.active)}"})
+        await websocket.close(code=1008)
+        return
+    latest_frame = None
+    frame_ready = asyncio.Event()
+    received = 0
+    dropped = 0
+
+    async def receive_frames():
+        nonlocal latest_frame, confidence, model, received, dropped
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                received += 1
+                if len(message["bytes"]) > MAX_IMAGE_MB * 1024 * 1024:
+                    await websocket.send_json({"success": False, "frame": received,
+                                               "error": f"Image larger than {MAX_IMAGE_MB:g} MB"})
+                    continue
+                if latest_frame is not None:
+                    dropped += 1
+                latest_frame = message["bytes"]
+                frame_ready.set()
+            elif message.get("text"):
+                # A bad settings message is reported and ignored; the stream keeps going
+                try:
+                    settings = json.loads(message["text"])
+                    if not isinstance(settings, dict):
+                        raise TypeError("settings must be a JSON object")
+                    new_confidence = float(settings.get("confidence", confidence))
+                    new_model = settings.get("model", model)
+                    if new_model is not None and new_model not in versions.active:
+                        raise ValueError(f"unknown model {new_model}, loaded: {sorted(versions.active)}")
+                except (ValueError, TypeError) as e:
+                    await websocket.send_json({"success": False, "error": f"Invalid settings: {e}"})
+                    continue
+                confidence = new_confidence
+                model = new_model
+
+    async def process_frames():
+        nonlocal latest_frame, dropped
+        while True:
+            await frame_ready.wait()
+            frame_ready.clear()
+            frame, latest_frame = latest_frame, None
+            frame_id = received
+            start = time.perf_counter()
+            requests_in_flight.inc()
+            reservation = None
+            try:
+                # Over the memory budget raises MemoryBudgetExceeded, so the frame counts as dropped
+                reservation = memory_budget.reserve(len(frame))
+                # Live frames rarely repeat, so they bypass the result cache
+                detections, names, _ = await run_detection(
+                    frame, confidence, annotate="none", use_cache=False, model=model,
+                    reservation=reservation
+                )
+                response = json_payload(detections, names)
+                record_request("ws", "ok", start)
+            except QueueFullError:
+                record_request("ws", "busy", start)
+                dropped += 1
+                continue
+            except Exception as e:
+                record_request("ws", "error", start)
+                response = {"success": False, "error": str(e)}
+            finally:
+                if reservation is not None:
+                    reservation.release()
+                requests_in_flight.dec()
+            response["frame"] = frame_id
+            response["dropped"] = dropped
+            await websocket.send_json(response)
+
+    receiver = asyncio.create_task(receive_frames())
+    processor = asyncio.create_task(process_frames())
+    try:
+        await asyncio.wait([receiver, processor], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        receiver.cancel()
+        processor.cancel()
 
 @app.get("/webcam/status")
 def webcam_status():
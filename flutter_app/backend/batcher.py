@@ -0,0 +1,249 @@
+"""
+Dynamic micro-batching for the ProDetect API
+Collects concurrent detection requests and runs them through the model as one batch
+"""
+import asyncio
+import time
+from collections import Counter
+
+
+class QueueFullError(Exception):
+    """Raised by submit when the batcher is saturated"""
+
+
+class MemoryBudgetExceeded(QueueFullError):
+    """Raised by MemoryBudget when admitting a request would exceed the budget"""
+
+
+class MemoryBudget:
+    """
+    Admission control on the estimated memory of requests in flight
+
+    reserve(n) returns a Reservation holding n bytes until it is released
+    (or its with block ends) and refuses (MemoryBudgetExceeded, answered
+    like a full queue) when the total would exceed max_bytes. A request is
+    always admitted when nothing else is reserved, so an image bigger than
+    the whole budget still runs, alone. Reservations that grow (see
+    Reservation.grow_to) only wait for running requests.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.reserved = 0
+        self.running = 0
+        self.peak = 0
+        self.rejected = 0
+
+    def _take(self, n, blocking):
+        """Add n bytes unless that goes over budget while blocking bytes are reserved"""
+        if n > 0 and blocking > 0 and self.reserved + n > self.max_bytes:
+            self.rejected += 1
+            raise MemoryBudgetExceeded(
+                f"{n / 1024 ** 2:.0f} MB more would exceed the budget ({self.reserved / 1024 ** 2:.0f} MB in use)"
+            )
+        self.reserved += n
+        self.peak = max(self.peak, self.reserved)
+
+    def reserve(self, n):
+        self._take(n, blocking=self.reserved)
+        return Reservation(self, n)
+
+    def snapshot(self):
+        return {
+            "reserved_bytes": self.reserved,
+            "running_bytes": self.running,
+            "peak_reserved_bytes": self.peak,
+            "max_bytes": self.max_bytes,
+            "rejected": self.rejected,
+        }
+
+
+class Reservation:
+    """
+    Bytes held in a MemoryBudget for one request
+
+    An upload reserves its own size before it is read; grow_to tops that
+    up to the full estimate once the decoded size is known, so the request
+    is counted once from the first byte read until release. Growing only
+    waits for requests that are already running (grown): uploads parked
+    before their own grow never block it, so they cannot deadlock each other.
+    """
+
+    def __init__(self, budget, nbytes):
+        self.budget = budget
+        self.nbytes = nbytes
+        self.running = False
+
+    def grow_to(self, nbytes):
+        """Hold at least nbytes and count as running; raises MemoryBudgetExceeded (keeping what is held)"""
+        extra = max(0, nbytes - self.nbytes)
+        if not self.running:
+            self.budget._take(extra, blocking=self.budget.running)
+            self.budget.running += self.nbytes + extra
+            self.running = True
+        else:
+            self.budget._take(extra, blocking=self.budget.running - self.nbytes)
+            self.budget.running += extra
+        self.nbytes += extra
+
+    def release(self):
+        self.budget.reserved -= self.nbytes
+        if self.running:
+            self.budget.running -= self.nbytes
+            self.running = False
+        self.nbytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class BatchMetrics:
+    """
+    Queue depth and batch size statistics used to tune the batcher
+
+    wait_histogram, if given, also receives every queue wait in seconds
+    (anything with an observe(value) method, e.g. a metrics.Histogram).
+    """
+
+    def __init__(self, wait_histogram=None):
+        self.wait_histogram = wait_histogram
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+        self.batch_sizes = Counter()
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_enqueue(self):
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+
+    def record_batch(self, waits):
+        self.queue_depth -= len(waits)
+        self.batches += 1
+        self.items += len(waits)
+        self.batch_sizes[len(waits)] += 1
+        self.total_wait += sum(waits)
+        self.max_wait = max(self.max_wait, max(waits))
+        if self.wait_histogram is not None:
+            for wait in waits:
+                self.wait_histogram.observe(wait)
+
+    def snapshot(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "batches": self.batches,
+            "items": self.items,
+            "rejected": self.rejected,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            "avg_queue_wait_ms": 1000 * self.total_wait / self.items if self.items else 0.0,
+            "max_queue_wait_ms": 1000 * self.max_wait,
+        }
+
+
+class MicroBatcher:
+    """
+    Groups items submitted from many coroutines into batches
+
+    A batch is dispatched as soon as it holds max_batch_size items or the
+    first item has waited max_wait_ms, whichever comes first. process_batch
+    receives a list of items and must return one result per item, in order;
+    a returned Exception instance fails only that item's request.
+
+    At most max_pending items may be queued or running at once; beyond
+    that submit raises QueueFullError instead of queueing without limit.
+    """
+
+    def __init__(self, process_batch, max_batch_size=8, max_wait_ms=10.0,
+                 executor=None, max_concurrent_batches=1, max_pending=None, wait_histogram=None):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.executor = executor
+        self.max_concurrent_batches = max_concurrent_batches
+        self.max_pending = max_pending
+        self.pending = 0
+        self.metrics = BatchMetrics(wait_histogram)
+        self._queue = None
+        self._slots = None
+        self._task = None
+
+    async def start(self):
+        """Start the scheduling loop on the running event loop"""
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop scheduling and fail anything still waiting in the queue"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._queue and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batcher stopped"))
+
+    async def submit(self, item):
+        """Queue one item and wait for its result"""
+        if self.max_pending is not None and self.pending >= self.max_pending:
+            self.metrics.rejected += 1
+            raise QueueFullError(f"{self.pending} requests already pending")
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future, time.perf_counter()))
+        self.metrics.record_enqueue()
+        self.pending += 1
+        try:
+            return await future
+        finally:
+            self.pending -= 1
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Wait for a free slot first so requests keep accumulating
+            # while the previous batch is still running
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            asyncio.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        loop = asyncio.get_running_loop()
+        now = time.perf_counter()
+        self.metrics.record_batch([now - queued_at for _, _, queued_at in batch])
+        items = [item for item, _, _ in batch]
+        try:
+            results = await loop.run_in_executor(self.executor, self.process_batch, items)
+        except Exception as e:
+            results = [e] * len(batch)
+        finally:
+            self._slots.release()
+
+        for (_, future, _), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
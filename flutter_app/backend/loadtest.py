@@ -0,0 +1,359 @@
+"""
+Load generator for the ProDetect API
+Replays POC_split/val images against /detect at a fixed concurrency
+(closed loop) or a fixed request rate (open loop) and reports throughput,
+latency percentiles, error rate and server CPU / memory over time
+
+Starts a local server with uvicorn unless --url is given, and only uses the
+standard library on the client side so it runs on any headless Linux box.
+In open-loop mode latency is measured from each request's scheduled send
+time, so a server that falls behind is not hidden by the client waiting.
+
+Usage:
+    python loadtest.py --concurrency 16 --duration 60
+    python loadtest.py --rate 20 --duration 60 --annotate none -o load.json
+    python loadtest.py --url http://edge-box:8000 --server-pid 4242 --concurrency 8
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from urllib.parse import urlparse
+
+import numpy as np
+
+# Shared dataset helpers live at the repository root
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT))
+from dataset_split import list_images
+
+
+def multipart_body(fields, file_bytes, filename):
+    """Encode form fields and one image file as multipart/form-data"""
+    boundary = uuid.uuid4().hex
+    parts = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in fields.items()
+    ]
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f'Content-Type: image/jpeg\r\n\r\n'.encode() + file_bytes + b'\r\n'
+    )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class Client:
+    """One keep-alive HTTP connection per thread"""
+
+    def __init__(self, url, timeout=60):
+        parsed = urlparse(url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def request(self, method, path, body=None, headers=None):
+        """Returns (status, response bytes); reconnects once if the connection dropped"""
+        for attempt in range(2):
+            conn = getattr(self.local, "conn", None)
+            if conn is None:
+                conn = self.local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                conn.close()
+                self.local.conn = None
+                if attempt:
+                    raise
+
+
+def process_tree(root_pid):
+    """root_pid and all of its descendants, from /proc"""
+    children = {}
+    for stat_path in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat_path.read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(stat_path.parent.name))
+    pids, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+def tree_usage(root_pid):
+    """(CPU seconds, RSS bytes) summed over a process tree"""
+    ticks = os.sysconf("SC_CLK_TCK")
+    page = os.sysconf("SC_PAGE_SIZE")
+    cpu, rss = 0.0, 0
+    for pid in process_tree(root_pid):
+        try:
+            fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+            cpu += (int(fields[11]) + int(fields[12])) / ticks
+            rss += int(Path(f"/proc/{pid}/statm").read_text().split()[1]) * page
+        except (OSError, IndexError):
+            continue
+    return cpu, rss
+
+
+class ServerSampler(threading.Thread):
+    """Samples server CPU, memory and the API's queue depth every interval"""
+
+    def __init__(self, client, server_pid=None, interval=1.0):
+        super().__init__(daemon=True)
+        self.client = client
+        self.server_pid = server_pid if server_pid and Path("/proc").exists() else None
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        start = time.perf_counter()
+        last_cpu, last_time = tree_usage(self.server_pid) if self.server_pid else (0.0, 0), start
+        while not self.stopped.wait(self.interval):
+            now = time.perf_counter()
+            sample = {"t": now - start}
+            if self.server_pid:
+                cpu, rss = tree_usage(self.server_pid)
+                sample["cpu_percent"] = 100 * (cpu - last_cpu[0]) / (now - last_time)
+                sample["rss_mb"] = rss / 1024 ** 2
+                last_cpu, last_time = (cpu, rss), now
+            try:
+                status, body = self.client.request("GET", "/stats")
+                if status == 200:
+                    batching = json.loads(body)["batching"]
+                    sample["queue_depth"] = batching.get("queue_depth")
+            except (OSError, ValueError, KeyError, http.client.HTTPException):
+                pass
+            self.samples.append(sample)
+
+
+def start_server(port, env_overrides):
+    """Start api.py under uvicorn on localhost and wait until it answers"""
+    env = {**os.environ, **env_overrides}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=Path(__file__).resolve().parent, env=env
+    )
+    client = Client(f"http://127.0.0.1:{port}", timeout=2)
+    deadline = time.perf_counter() + 180
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            if client.request("GET", "/")[0] == 200:
+                return server
+        except OSError:
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("Server did not become ready within 180 s")
+
+
+def run_load(client, payloads, concurrency, duration, rate=None, max_requests=None, fields=None,
+             bust_cache=True):
+    """
+    Send requests from concurrency threads until duration or max_requests
+
+    Returns one record per request: scheduled/finished time, latency, status.
+    """
+    records = []
+    lock = threading.Lock()
+    counter = iter(range(max_requests or sys.maxsize))
+    start = time.perf_counter()
+    stop_at = start + duration
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            scheduled = start + i / rate if rate else time.perf_counter()
+            if scheduled >= stop_at:
+                return
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            name, data = payloads[i % len(payloads)]
+            if bust_cache:
+                # Trailing bytes after the JPEG end marker change the content
+                # hash (no result-cache hits) but decode to the same image
+                data = data + uuid.uuid4().bytes
+            body, content_type = multipart_body(fields or {}, data, name)
+            status, error = None, None
+            try:
+                status, _ = client.request("POST", "/detect", body, {"Content-Type": content_type})
+            except Exception as e:
+                error = type(e).__name__
+            finished = time.perf_counter()
+            with lock:
+                records.append({
+                    "scheduled": scheduled - start,
+                    "finished": finished - start,
+                    "latency_ms": (finished - scheduled) * 1000,
+                    "status": status,
+                    "error": error,
+                })
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return records
+
+
+def summarize(records, elapsed):
+    ok = [r for r in records if r["status"] == 200]
+    outcomes = {}
+    for r in records:
+        key = str(r["status"]) if r["status"] is not None else r["error"]
+        outcomes[key] = outcomes.get(key, 0) + 1
+    latencies = np.array([r["latency_ms"] for r in ok])
+    if ok:
+        latency = {
+            "mean": float(latencies.mean()),
+            **{f"p{p}": float(np.percentile(latencies, p)) for p in (50, 90, 95, 99)},
+            "max": float(latencies.max()),
+        }
+    else:
+        # No successful request: no latency to report (not 0 ms)
+        latency = dict.fromkeys(("mean", "p50", "p90", "p95", "p99", "max"))
+    return {
+        "requests": len(records),
+        "ok": len(ok),
+        "error_rate": 1 - len(ok) / len(records) if records else 0.0,
+        "outcomes": outcomes,
+        "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+        "latency_ms": latency,
+    }
+
+
+def timeline(records, samples, interval=1.0):
+    """Per-interval completions, p95 latency and errors, merged with server samples"""
+    if not records:
+        return []
+    buckets = {}
+    for r in records:
+        buckets.setdefault(int(r["finished"] // interval), []).append(r)
+    rows = []
+    for second in range(max(buckets) + 1):
+        bucket = buckets.get(second, [])
+        ok = [r["latency_ms"] for r in bucket if r["status"] == 200]
+        row = {
+            "t": (second + 1) * interval,
+            "completed": len(ok),
+            "errors": len(bucket) - len(ok),
+            "p95_ms": float(np.percentile(ok, 95)) if ok else None,
+        }
+        nearest = min(samples, key=lambda s: abs(s["t"] - row["t"]), default=None)
+        if nearest and abs(nearest["t"] - row["t"]) <= interval:
+            row.update({k: v for k, v in nearest.items() if k != "t"})
+        rows.append(row)
+    return rows
+
+
+def print_report(summary, rows):
+    print(f"\n{'='*72}")
+    print("Load Test Timeline")
+    print(f"{'='*72}")
+    print(f"{'t (s)':>6}{'ok/s':>7}{'errors':>8}{'p95 ms':>9}{'server CPU%':>13}{'RSS MB':>9}{'queue':>7}")
+    for row in rows:
+        p95 = f"{row['p95_ms']:.0f}" if row["p95_ms"] is not None else "-"
+        cpu = f"{row['cpu_percent']:.0f}" if "cpu_percent" in row else "-"
+        rss = f"{row['rss_mb']:.0f}" if "rss_mb" in row else "-"
+        queue = row.get("queue_depth")
+        print(f"{row['t']:>6.0f}{row['completed']:>7}{row['errors']:>8}{p95:>9}{cpu:>13}{rss:>9}"
+              f"{queue if queue is not None else '-':>7}")
+
+    lat = summary["latency_ms"]
+    print(f"\n{'='*72}")
+    print("Load Test Summary")
+    print(f"{'='*72}")
+    print(f"Requests: {summary['requests']}  OK: {summary['ok']}  Error rate: {summary['error_rate']:.1%}")
+    print(f"Outcomes: {summary['outcomes']}")
+    print(f"Throughput: {summary['throughput_rps']:.1f} req/s")
+    if summary["ok"]:
+        print(f"Latency ms: p50 {lat['p50']:.0f}  p90 {lat['p90']:.0f}  p95 {lat['p95']:.0f}  "
+              f"p99 {lat['p99']:.0f}  max {lat['max']:.0f}")
+    else:
+        print("Latency ms: - (no successful requests)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the ProDetect /detect endpoint")
+    parser.add_argument('--url', help="Existing server; a local one is started when omitted")
+    parser.add_argument('--port', type=int, default=8765, help="Port for the local server")
+    parser.add_argument('--server-pid', type=int, help="PID of an existing server to sample CPU/memory for")
+    parser.add_argument('--images', default=str(REPO_ROOT / 'POC_split/val/images'))
+    parser.add_argument('--concurrency', type=int, default=8, help="Client threads (max requests in flight)")
+    parser.add_argument('--rate', type=float, help="Open loop: requests per second (default: closed loop)")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds to send for")
+    parser.add_argument('--requests', type=int, help="Stop after this many requests")
+    parser.add_argument('--confidence', type=float, default=0.25)
+    parser.add_argument('--annotate', default='full', choices=['full', 'thumbnail', 'none'])
+    parser.add_argument('--allow-cache', action='store_true',
+                        help="Send identical bytes so repeated images can hit the result cache")
+    parser.add_argument('--workers', type=int, help="PRODETECT_WORKERS for the local server")
+    parser.add_argument('-o', '--output', help="Write summary, timeline and raw records as JSON")
+    args = parser.parse_args()
+
+    payloads = [(p.name, p.read_bytes()) for p in map(Path, list_images(args.images))]
+    if not payloads:
+        sys.exit(f"No images found in {args.images}")
+
+    server = None
+    url = args.url
+    server_pid = args.server_pid
+    if url is None:
+        env = {"PRODETECT_WORKERS": str(args.workers)} if args.workers else {}
+        print(f"Starting local server on port {args.port}...")
+        server = start_server(args.port, env)
+        url, server_pid = f"http://127.0.0.1:{args.port}", server.pid
+
+    try:
+        mode = f"open loop at {args.rate} req/s" if args.rate else "closed loop"
+        print(f"Replaying {len(payloads)} images against {url}: {args.concurrency} threads, {mode}, "
+              f"{args.duration:.0f} s")
+        sampler = ServerSampler(Client(url, timeout=5), server_pid)
+        sampler.start()
+        start = time.perf_counter()
+        records = run_load(
+            Client(url), payloads, args.concurrency, args.duration, rate=args.rate,
+            max_requests=args.requests, bust_cache=not args.allow_cache,
+            fields={"confidence": args.confidence, "annotate": args.annotate},
+        )
+        elapsed = time.perf_counter() - start
+        sampler.stopped.set()
+        sampler.join()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    summary = summarize(records, elapsed)
+    rows = timeline(records, sampler.samples)
+    print_report(summary, rows)
+    if args.output:
+        report = {"url": url, "config": vars(args), "summary": summary, "timeline": rows,
+                  "server_samples": sampler.samples, "records": records}
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Named model versions for the ProDetect API
+Maps registry names (models.json) to versions loaded in the inference
+workers and swaps them without a restart
+"""
+import asyncio
+import sys
+from collections import Counter
+from pathlib import Path
+
+# Shared model helpers live at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from model_loader import get_model_version, resolve_model_path
+
+
+class ModelVersions:
+    """
+    Tracks which loaded version each model name currently points to
+
+    A swap is a single dict assignment on the event loop, so every request
+    sees either the old or the new version, never a mix. Requests hold a
+    reference to their version from acquire to release; a version that no
+    name points to any more is unloaded from the workers once its last
+    in-flight request has finished.
+    """
+
+    def __init__(self, pool, runtime="auto", imgsz=640):
+        self.pool = pool
+        self.runtime = runtime
+        self.imgsz = imgsz
+        self.active = {}       # name -> version id
+        self.paths = {}        # version id -> artifact path
+        self.refs = Counter()  # version id -> requests in flight
+        self._lock = None
+        self._unloading = set()
+
+    async def load(self, name, weights_path, rolling=True):
+        """
+        Load, warm and activate weights_path under name
+
+        Returns (version id, {worker pid: load seconds}). Reloading a
+        checkpoint that has not changed on disk is a no-op swap. rolling
+        loads the workers one at a time so the others keep serving.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        model_path = resolve_model_path(weights_path, self.runtime)[0]
+        version = get_model_version(model_path)
+        async with self._lock:
+            load_seconds = {}
+            if version not in self.paths:
+                load_seconds = await self.pool.load(version, weights_path, self.runtime, self.imgsz, rolling)
+                self.paths[version] = str(model_path)
+            previous, self.active[name] = self.active.get(name), version
+        if previous is not None and previous != version:
+            self._maybe_unload(previous)
+        return version, load_seconds
+
+    def acquire(self, name):
+        """Pin the version currently serving name; raises KeyError for unknown names"""
+        version = self.active[name]
+        self.refs[version] += 1
+        return version
+
+    def release(self, version):
+        self.refs[version] -= 1
+        self._maybe_unload(version)
+
+    def _maybe_unload(self, version):
+        if self.refs[version] > 0 or version in self.active.values() or version in self._unloading:
+            return
+        self._unloading.add(version)
+        asyncio.create_task(self._unload(version))
+
+    async def _unload(self, version):
+        try:
+            async with self._lock:
+                # It may have been re-activated while waiting for the lock
+                if self.refs[version] == 0 and version not in self.active.values():
+                    await self.pool.unload(version)
+                    self.paths.pop(version, None)
+                    del self.refs[version]
+        finally:
+            self._unloading.discard(version)
+
+    def snapshot(self):
+        return {
+            name: {"version": version, "path": self.paths[version], "in_flight": self.refs[version]}
+            for name, version in self.active.items()
+        }
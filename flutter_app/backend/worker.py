@@ -0,0 +1,348 @@
+"""
+Inference worker processes for the ProDetect API
+Each worker holds every loaded model version and does all CPU-bound work:
+decode, inference, plotting and JPEG encoding. The API process only does
+I/O and turns the returned detection arrays into responses.
+
+Every worker is its own single-process executor, so a model reload can
+visit the workers one at a time while the others keep serving.
+"""
+import asyncio
+import multiprocessing
+import os
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+# Shared detection helpers live at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+import detections as dets
+from cpu_affinity import pin_worker, split_cores
+from tiled_inference import detect_tiled
+from model_loader import load_model, warm_up
+
+# Per worker process: version id -> loaded model, filled by load_version
+models = {}
+
+ANNOTATE_MODES = ("full", "thumbnail", "none")
+THUMBNAIL_SIZE = 320
+
+# JPEGs are decoded at 1/2, 1/4 or 1/8 scale (DCT scaling, never fully
+# decoded) as long as the long side stays at least this large
+DECODE_SIZE = int(os.environ.get("PRODETECT_DECODE_SIZE", 640))
+REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+# JPEG start-of-frame markers (they carry the image size)
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class DetectionJob(NamedTuple):
+    """
+    One image submitted to the worker tier
+
+    Inference runs at infer_conf and the raw detections at that floor are
+    returned, while the annotated image only shows boxes at confidence.
+    When detections is given (a cache hit) inference is skipped and the
+    image is only decoded for drawing. Tiled jobs run sliced inference on
+    their own instead of joining the shared forward pass. model_version
+    picks the loaded model, so a job keeps the version it was submitted
+    with even if a newer one is swapped in meanwhile.
+    """
+    contents: bytes
+    confidence: float = 0.25
+    annotate: str = "full"
+    infer_conf: float = None
+    detections: object = None
+    tiled: bool = False
+    model_version: str = None
+
+
+def init_worker(core_queue):
+    """Pin this worker to its share of the cores; models arrive through InferencePool.load"""
+    pin_worker(core_queue)
+
+
+def load_version(version, model_path, runtime="auto", imgsz=640):
+    """Load and warm one model version; returns (pid, load seconds)"""
+    start = time.perf_counter()
+    if version not in models:
+        model = load_model(model_path, runtime)
+        warm_up(model, imgsz)
+        models[version] = model
+    return os.getpid(), time.perf_counter() - start
+
+
+def unload_version(version):
+    models.pop(version, None)
+    return os.getpid()
+
+
+def image_header(contents):
+    """("jpeg" | "png", width, height) read from the header without decoding, or None"""
+    if contents[:8] == b"\x89PNG\r\n\x1a\n" and len(contents) >= 24:
+        width, height = struct.unpack(">II", contents[16:24])
+        return "png", width, height
+    if contents[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 <= len(contents):
+        if contents[i] != 0xFF:
+            return None
+        marker = contents[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in SOF_MARKERS:
+            height, width = struct.unpack(">HH", contents[i + 5:i + 9])
+            return "jpeg", width, height
+        i += 2 + struct.unpack(">H", contents[i + 2:i + 4])[0]
+    return None
+
+
+def decode_plan(contents, reduce=True):
+    """
+    (imread flag, scale factor, header) for decoding an upload
+
+    Large JPEGs get the biggest DCT reduction that keeps the long side at
+    or above DECODE_SIZE; everything else is decoded at full size.
+    """
+    header = image_header(contents)
+    if reduce and header is not None and header[0] == "jpeg":
+        long_side = max(header[1], header[2])
+        for factor, flag in REDUCED_FLAGS:
+            if long_side / factor >= DECODE_SIZE:
+                return flag, factor, header
+    return cv2.IMREAD_COLOR, 1, header
+
+
+def decode_image(contents, reduce=True):
+    """
+    Decode uploaded bytes into a BGR image, reduced in size when possible
+
+    Returns (image, (sx, sy)): multiply box coordinates on the returned
+    image by sx / sy to get coordinates in the original image.
+    """
+    flag, factor, header = decode_plan(contents, reduce)
+    # frombuffer is a view; the upload bytes are not copied again
+    image = cv2.imdecode(np.frombuffer(contents, np.uint8), flag)
+    if image is None:
+        raise ValueError("Could not decode image")
+    if factor == 1:
+        return image, (1.0, 1.0)
+    h, w = image.shape[:2]
+    width, height = header[1], header[2]
+    if (w >= h) != (width >= height):  # EXIF rotation was applied
+        width, height = height, width
+    return image, (width / w, height / h)
+
+
+def encode_annotation(image, detections, names, annotate, timings=None):
+    """
+    Draw detections and JPEG-encode the result, optionally as a thumbnail
+
+    When timings is a dict, the plot (including the thumbnail resize) and
+    imencode durations are stored in it in seconds.
+    """
+    start = time.perf_counter()
+    annotated_image = dets.draw_detections(image, detections, names)
+    if annotate == "thumbnail":
+        h, w = annotated_image.shape[:2]
+        scale = THUMBNAIL_SIZE / max(h, w)
+        if scale < 1:
+            annotated_image = cv2.resize(
+                annotated_image, (int(w * scale), int(h * scale)),
+                interpolation=cv2.INTER_AREA
+            )
+    plotted = time.perf_counter()
+    _, buffer = cv2.imencode('.jpg', annotated_image)
+    if timings is not None:
+        timings["plot"] = plotted - start
+        timings["imencode"] = time.perf_counter() - plotted
+    return buffer.tobytes()
+
+
+def run_detection_batch(jobs):
+    """
+    Decode and run one batched forward pass per model version over a list of DetectionJobs
+
+    Each job gets back a dict with the raw detections array, the floor it
+    was taken at, the class names, the JPEG annotated image (or None) and
+    per-stage timings in seconds. The model stage is the wall time of the
+    forward pass the image was part of.
+    """
+    responses = [None] * len(jobs)
+    images = {}
+    scales = {}
+    timings = [{} for _ in jobs]
+    for i, job in enumerate(jobs):
+        start = time.perf_counter()
+        try:
+            # Tiled jobs need every pixel; everything else can decode reduced
+            images[i], scales[i] = decode_image(job.contents, reduce=not job.tiled)
+        except Exception as e:
+            responses[i] = e
+        timings[i]["imdecode"] = time.perf_counter() - start
+
+    for i in images:
+        if jobs[i].model_version not in models:
+            responses[i] = KeyError(f"Model version {jobs[i].model_version} is not loaded")
+    images = {i: image for i, image in images.items() if responses[i] is None}
+
+    # Each shared pass uses the loosest threshold among its jobs; jobs that
+    # already carry cached detections skip inference entirely
+    to_infer = {}
+    raw = {}
+    for i in images:
+        job = jobs[i]
+        if job.detections is not None:
+            continue
+        if not job.tiled:
+            to_infer.setdefault(job.model_version, []).append(i)
+            continue
+        floor = job.confidence if job.infer_conf is None else job.infer_conf
+        start = time.perf_counter()
+        try:
+            raw[i] = (detect_tiled(models[job.model_version], images[i], conf=floor)[0], floor)
+        except Exception as e:
+            responses[i] = e
+        timings[i]["model"] = time.perf_counter() - start
+    for version, indices in to_infer.items():
+        floor = min(
+            jobs[i].confidence if jobs[i].infer_conf is None else jobs[i].infer_conf
+            for i in indices
+        )
+        start = time.perf_counter()
+        try:
+            results = models[version]([images[i] for i in indices], conf=floor, verbose=False)
+        except Exception as e:
+            # Only this version's jobs fail; other versions in the batch still run
+            for i in indices:
+                responses[i] = e
+            continue
+        elapsed = time.perf_counter() - start
+        for i, result in zip(indices, results):
+            raw[i] = (dets.scale_boxes(dets.from_result(result), *scales[i]), floor)
+            timings[i]["model"] = elapsed
+
+    for i, image in images.items():
+        job = jobs[i]
+        if responses[i] is not None:
+            continue
+        try:
+            names = models[job.model_version].names
+            detections, floor = raw.get(i, (job.detections, None))
+            annotated_image = None
+            if job.annotate != "none":
+                # Drawn on the (possibly reduced) decoded image
+                sx, sy = scales[i]
+                shown = dets.scale_boxes(dets.filter_confidence(detections, job.confidence), 1 / sx, 1 / sy)
+                annotated_image = encode_annotation(image, shown, names, job.annotate, timings[i])
+            responses[i] = {
+                "detections": detections,
+                "floor": floor,
+                "names": names,
+                "annotated_image": annotated_image,
+                "timings": timings[i]
+            }
+        except Exception as e:
+            responses[i] = e
+    return responses
+
+
+class InferencePool(Executor):
+    """
+    Pool of model-holding worker processes, each pinned to its own cores
+
+    Each worker is a single-process executor. The pool itself is an
+    Executor: submit sends a call to the least busy worker that is not
+    reloading, so the batcher can dispatch to it directly.
+
+    Model versions are loaded into every worker one worker at a time (a
+    rolling reload): a reloading worker gets no new batches, finishes the
+    one it is running, loads and warms the model, and only then is the next
+    worker taken out of rotation. With a single worker, serving pauses for
+    the load since there is nobody else to take the traffic.
+    """
+
+    def __init__(self, num_workers=2):
+        self.num_workers = num_workers
+        self.executors = []
+        self._busy = []
+        self._reloading = set()
+        self._lock = threading.Lock()
+        self._reload_lock = None
+
+    async def start(self):
+        # spawn instead of fork so workers never inherit torch/OpenMP state
+        ctx = multiprocessing.get_context("spawn")
+        core_queue = ctx.Queue()
+        for cores in split_cores(self.num_workers):
+            core_queue.put(cores)
+        self._reload_lock = asyncio.Lock()
+        self._busy = [0] * self.num_workers
+        self.executors = [
+            ProcessPoolExecutor(max_workers=1, mp_context=ctx, initializer=init_worker, initargs=(core_queue,))
+            for _ in range(self.num_workers)
+        ]
+
+    def submit(self, fn, /, *args, **kwargs):
+        """Run fn on the least busy worker that is not reloading"""
+        with self._lock:
+            serving = [i for i in range(self.num_workers) if i not in self._reloading]
+            index = min(serving or range(self.num_workers), key=lambda i: self._busy[i])
+            self._busy[index] += 1
+        future = self.executors[index].submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda _: self._finished(index))
+        return future
+
+    def _finished(self, index):
+        with self._lock:
+            self._busy[index] -= 1
+
+    async def run_on_worker(self, index, fn, *args):
+        """Run fn(*args) on one particular worker, after anything already queued there"""
+        return await asyncio.wrap_future(self.executors[index].submit(fn, *args))
+
+    async def load(self, version, model_path, runtime="auto", imgsz=640, rolling=True):
+        """
+        Load and warm a model version in every worker; returns {pid: load seconds}
+
+        rolling loads one worker at a time so the rest keep serving; without
+        it (at startup, before any traffic) all workers load at once.
+        """
+        args = (version, str(model_path), runtime, imgsz)
+        async with self._reload_lock:
+            if not rolling:
+                return dict(await asyncio.gather(*[
+                    self.run_on_worker(index, load_version, *args) for index in range(self.num_workers)
+                ]))
+            load_seconds = {}
+            for index in range(self.num_workers):
+                with self._lock:
+                    self._reloading.add(index)
+                try:
+                    pid, seconds = await self.run_on_worker(index, load_version, *args)
+                finally:
+                    with self._lock:
+                        self._reloading.discard(index)
+                load_seconds[pid] = seconds
+        return load_seconds
+
+    async def unload(self, version):
+        """Drop a version from every worker (nothing is using it any more)"""
+        async with self._reload_lock:
+            await asyncio.gather(*[
+                self.run_on_worker(index, unload_version, version) for index in range(self.num_workers)
+            ])
+
+    def shutdown(self, wait=True, *, cancel_futures=True):
+        for executor in self.executors:
+            executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+        self.executors = []
@@ -0,0 +1,177 @@
+"""
+Pre-decoded, resized image cache for repeated training runs
+Decodes every training image once, resizes it the way Ultralytics'
+load_image does for the training imgsz (long side = imgsz, aspect kept) and
+stores all of them back to back in a single uint8 file with an offset index
+
+Training then maps that file with np.memmap and hands out views into it, so
+no JPEG is decoded or resized again and the data loader workers share the
+same page cache. Padding to the square input is left to Ultralytics'
+letterbox/mosaic transforms as usual, so normalized labels stay valid. The
+cache records a blake2b hash of every source file and is rebuilt when an
+image changes, appears or disappears, or when imgsz differs.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+from ultralytics.models.yolo.detect import DetectionTrainer
+
+from detection_cache import content_hash
+
+CACHE_VERSION = 1
+
+ENTRY_DTYPE = np.dtype([
+    ("offset", np.int64),
+    ("h", np.int32), ("w", np.int32),      # cached (resized) size
+    ("h0", np.int32), ("w0", np.int32),    # original size
+])
+
+
+def cache_dir_for(source, imgsz):
+    """Cache location for an image directory or .txt list: POC_split/train.txt -> POC_split/train.imgcache640"""
+    return Path(str(source).rstrip("/\\")).with_suffix(f".imgcache{imgsz}")
+
+
+def hash_file(path):
+    with open(path, 'rb') as f:
+        return content_hash(f.read())
+
+
+def source_hashes(image_files, workers=8):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(hash_file, image_files))
+
+
+def decode_resized(path, imgsz, augment=True):
+    """Decode and resize like Ultralytics' BaseDataset.load_image with rect_mode"""
+    image = cv2.imread(str(path))
+    if image is None:
+        raise FileNotFoundError(f"Could not read image {path}")
+    h0, w0 = image.shape[:2]
+    r = imgsz / max(h0, w0)
+    if r != 1:
+        w, h = min(int(np.ceil(w0 * r)), imgsz), min(int(np.ceil(h0 * r)), imgsz)
+        interpolation = cv2.INTER_LINEAR if (augment or r > 1) else cv2.INTER_AREA
+        image = cv2.resize(image, (w, h), interpolation=interpolation)
+    return image, (h0, w0)
+
+
+class ImageCache:
+    """Read side of a built cache: image(i) returns a view into the memory-mapped file"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        with open(self.cache_dir / "meta.json") as f:
+            self.meta = json.load(f)
+        self.entries = np.load(self.cache_dir / "index.npy")
+        self._data = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getstate__(self):
+        # Data loader workers re-open the map instead of pickling its contents
+        return {**self.__dict__, "_data": None}
+
+    @property
+    def data(self):
+        if self._data is None:
+            # Copy-on-write: in-place transforms never touch the file
+            self._data = np.memmap(self.cache_dir / "images.bin", dtype=np.uint8, mode="c")
+        return self._data
+
+    def image(self, i):
+        """(image view, original (h, w), cached (h, w))"""
+        offset, h, w, h0, w0 = self.entries[i].tolist()
+        return self.data[offset:offset + h * w * 3].reshape(h, w, 3), (h0, w0), (h, w)
+
+
+def is_valid(cache_dir, image_files, imgsz, augment, hashes):
+    try:
+        with open(Path(cache_dir) / "meta.json") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (meta.get("version") == CACHE_VERSION and meta.get("imgsz") == imgsz
+            and meta.get("augment") == augment and meta.get("files") == [str(p) for p in image_files]
+            and meta.get("hashes") == hashes)
+
+
+def build_image_cache(image_files, imgsz, cache_dir, augment=True, workers=None):
+    """
+    Decode and resize every image into cache_dir unless a valid cache is already there
+
+    Returns an ImageCache. Images are decoded on a thread pool (OpenCV
+    releases the GIL) and streamed to disk in order, so memory use stays at
+    a few images regardless of dataset size.
+    """
+    image_files = [Path(p) for p in image_files]
+    cache_dir = Path(cache_dir)
+    workers = workers or min(8, os.cpu_count() or 1)
+    hashes = source_hashes(image_files, workers)
+    if is_valid(cache_dir, image_files, imgsz, augment, hashes):
+        return ImageCache(cache_dir)
+
+    print(f"Caching {len(image_files)} images at imgsz={imgsz} -> {cache_dir}")
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    (cache_dir / "meta.json").unlink(missing_ok=True)  # invalid until fully rewritten
+    entries = np.zeros(len(image_files), dtype=ENTRY_DTYPE)
+    offset = 0
+    with open(cache_dir / "images.bin", 'wb') as out, ThreadPoolExecutor(max_workers=workers) as executor:
+        decoded = executor.map(lambda p: decode_resized(p, imgsz, augment), image_files)
+        for i, (image, (h0, w0)) in enumerate(decoded):
+            image = np.ascontiguousarray(image)
+            out.write(image.tobytes())
+            h, w = image.shape[:2]
+            entries[i] = (offset, h, w, h0, w0)
+            offset += image.nbytes
+
+    np.save(cache_dir / "index.npy", entries)
+    with open(cache_dir / "meta.json", 'w') as f:
+        json.dump({"version": CACHE_VERSION, "imgsz": imgsz, "augment": augment,
+                   "files": [str(p) for p in image_files], "hashes": hashes}, f)
+    print(f"Cached {offset / 1024 ** 2:.0f} MB of decoded images")
+    return ImageCache(cache_dir)
+
+
+class CachedImageLoader:
+    """
+    Drop-in replacement for a YOLODataset's load_image backed by an ImageCache
+
+    Keeps the dataset's mosaic buffer up to date the same way the original
+    method does, but never holds decoded images in RAM itself.
+    """
+
+    def __init__(self, dataset, cache):
+        self.dataset = dataset
+        self.cache = cache
+
+    def __call__(self, i, rect_mode=True):
+        dataset = self.dataset
+        if not rect_mode:
+            return type(dataset).load_image(dataset, i, rect_mode)
+        image, hw0, hw = self.cache.image(i)
+        if dataset.augment:
+            dataset.buffer.append(i)
+            if 1 < len(dataset.buffer) >= dataset.max_buffer_length:
+                dataset.buffer.pop(0)
+        return image, hw0, hw
+
+
+def attach_image_cache(dataset, img_path, imgsz):
+    """Serve a built Ultralytics dataset's images from the cache for img_path"""
+    cache = build_image_cache(dataset.im_files, imgsz, cache_dir_for(img_path, imgsz), augment=dataset.augment)
+    dataset.load_image = CachedImageLoader(dataset, cache)
+    return dataset
+
+
+class CachedImageTrainer(DetectionTrainer):
+    """DetectionTrainer whose train and val datasets read from the image cache"""
+
+    def build_dataset(self, img_path, mode="train", batch=None):
+        dataset = super().build_dataset(img_path, mode, batch)
+        return attach_image_cache(dataset, img_path, self.args.imgsz)
@@ -0,0 +1,190 @@
+"""
+Cached, memory-mapped index of YOLO label files
+Parses a labels directory once into a flat NumPy structured array (one row
+per box) so dataset scripts can compute class statistics, splits and
+samples with array operations instead of re-reading thousands of small
+.txt files
+
+Like the labels.cache files Ultralytics writes, the index is saved next to
+the labels directory (POC/labels -> POC/labels.index.npy plus a .json with
+the file list) and rebuilt whenever a label file's name, size or mtime
+changes. The rows are loaded with mmap_mode="r", so processes that open the
+same index share its pages instead of each holding a copy.
+"""
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+
+LABEL_DTYPE = np.dtype([
+    ("image", np.int32),       # index into LabelIndex.stems
+    ("cls", np.int16),
+    ("box", np.float32, (4,)),  # normalized x_center, y_center, width, height
+])
+
+INDEX_VERSION = 1
+
+# 12_aug0, 12_aug1, ... are derivatives of source image 12
+AUGMENTED_SUFFIX = re.compile(r"_aug\d+$")
+
+
+def source_stem(stem):
+    """Stem of the original image an (augmented) image was derived from"""
+    return AUGMENTED_SUFFIX.sub("", stem)
+
+
+class LabelIndex:
+    """Label rows sorted by image id, with one stem per image id"""
+
+    def __init__(self, stems, rows):
+        self.stems = list(stems)
+        self.rows = rows
+        self._offsets = None
+        self._positions = None
+
+    def __len__(self):
+        return len(self.stems)
+
+    @property
+    def num_classes(self):
+        return int(self.rows["cls"].max()) + 1 if len(self.rows) else 0
+
+    def labels_for(self, image_id):
+        """(classes, normalized xywh boxes) of one image"""
+        if self._offsets is None:
+            self._offsets = np.searchsorted(self.rows["image"], np.arange(len(self.stems) + 1))
+        rows = self.rows[self._offsets[image_id]:self._offsets[image_id + 1]]
+        return rows["cls"].astype(np.int64), np.array(rows["box"], dtype=np.float32)
+
+    def labels_for_stem(self, stem):
+        """(classes, normalized xywh boxes) of an image by stem; empty if it has no labels"""
+        if self._positions is None:
+            self._positions = {s: i for i, s in enumerate(self.stems)}
+        if stem not in self._positions:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, 4), dtype=np.float32)
+        return self.labels_for(self._positions[stem])
+
+    def select(self, stems):
+        """New index over the given stems, in that order; stems without labels get no rows"""
+        position = {stem: i for i, stem in enumerate(self.stems)}
+        remap = np.full(len(self.stems) + 1, -1, dtype=np.int32)
+        for new_id, stem in enumerate(stems):
+            if stem in position:
+                remap[position[stem]] = new_id
+        new_ids = remap[self.rows["image"]]
+        rows = self.rows[new_ids >= 0].copy()
+        rows["image"] = new_ids[new_ids >= 0]
+        return LabelIndex(stems, rows[np.argsort(rows["image"], kind="stable")])
+
+    def count_matrix(self, num_classes=None):
+        """(images, classes) matrix of box counts per image"""
+        num_classes = num_classes or self.num_classes
+        counts = np.zeros((len(self.stems), num_classes), dtype=np.int64)
+        np.add.at(counts, (self.rows["image"], self.rows["cls"]), 1)
+        return counts
+
+    def class_counts(self, image_ids=None, num_classes=None):
+        """Box count per class, optionally only over some image ids"""
+        rows = self.rows if image_ids is None else self.rows[np.isin(self.rows["image"], image_ids)]
+        return np.bincount(rows["cls"], minlength=num_classes or self.num_classes)
+
+    def images_with_class(self, cls_id):
+        """Image ids that contain at least one box of a class, e.g. for balanced sampling"""
+        return np.unique(self.rows["image"][self.rows["cls"] == cls_id])
+
+    def groups(self):
+        """(group id per image, group names) where a group is a source image and its augmentations"""
+        names, group_ids = np.unique([source_stem(s) for s in self.stems], return_inverse=True)
+        return group_ids, list(names)
+
+
+def parse_label_file(label_path):
+    """(N, 5) float32 array of class, x, y, w, h rows; empty if missing or malformed"""
+    try:
+        with open(label_path) as f:
+            text = f.read()
+        values = np.array(text.split(), dtype=np.float32)
+    except (OSError, ValueError):
+        return np.zeros((0, 5), dtype=np.float32)
+    if values.size % 5:
+        # Rows with extra columns (segments) or stray tokens: keep the first five per line
+        rows = [line.split()[:5] for line in text.splitlines() if len(line.split()) >= 5]
+        values = np.array(rows, dtype=np.float32)
+    return values.reshape(-1, 5)
+
+
+def scan_labels(labels_dir):
+    """Sorted (name, mtime_ns, size) of every label file in a directory"""
+    with os.scandir(labels_dir) as entries:
+        files = [
+            (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+            for entry in entries if entry.name.endswith(".txt") and entry.is_file()
+        ]
+    return sorted(files)
+
+
+def build_label_index(label_files):
+    """Parse label files into a LabelIndex, one image id per file in the given order"""
+    parts, image_ids = [], []
+    for i, label_file in enumerate(label_files):
+        values = parse_label_file(label_file)
+        parts.append(values)
+        image_ids.append(np.full(len(values), i, dtype=np.int32))
+
+    values = np.concatenate(parts) if parts else np.zeros((0, 5), dtype=np.float32)
+    rows = np.zeros(len(values), dtype=LABEL_DTYPE)
+    rows["image"] = np.concatenate(image_ids) if image_ids else []
+    rows["cls"] = values[:, 0]
+    rows["box"] = values[:, 1:5]
+    return LabelIndex([Path(p).stem for p in label_files], rows)
+
+
+def index_paths(labels_dir):
+    labels_dir = Path(labels_dir)
+    return labels_dir.with_suffix(".index.npy"), labels_dir.with_suffix(".index.json")
+
+
+def load_label_index(labels_dir, image_paths=None):
+    """
+    Label index for a directory, from the cache when it is still valid
+
+    With image_paths the index is narrowed to those images, in that order,
+    which is what the split and augmentation scripts work on.
+    """
+    labels_dir = Path(labels_dir)
+    rows_path, meta_path = index_paths(labels_dir)
+    files = scan_labels(labels_dir) if labels_dir.is_dir() else []
+    signature = hashlib.blake2b(
+        "\n".join(f"{name}:{mtime}:{size}" for name, mtime, size in files).encode(), digest_size=16
+    ).hexdigest()
+
+    index = None
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta["version"] == INDEX_VERSION and meta["hash"] == signature:
+            index = LabelIndex(meta["stems"], np.load(rows_path, mmap_mode="r"))
+    except (OSError, ValueError, KeyError):
+        pass
+
+    if index is None:
+        index = build_label_index([labels_dir / name for name, _, _ in files])
+        try:
+            # Write both files atomically so a concurrent reader never sees half an index
+            tmp_rows = rows_path.with_suffix(".tmp.npy")
+            np.save(tmp_rows, index.rows)
+            os.replace(tmp_rows, rows_path)
+            tmp_meta = meta_path.with_suffix(".tmp")
+            with open(tmp_meta, 'w') as f:
+                json.dump({"version": INDEX_VERSION, "hash": signature, "stems": index.stems}, f)
+            os.replace(tmp_meta, meta_path)
+            print(f"Indexed {len(files)} label files -> {rows_path}")
+        except OSError as e:
+            print(f"Warning: could not save label index ({e})")  # read-only dataset: index stays in memory
+
+    if image_paths is not None:
+        index = index.select([Path(p).stem for p in image_paths])
+    return index
@@ -0,0 +1,118 @@
+"""
+Threaded capture -> inference pipeline for live video detection
+A capture thread keeps only the newest frame, an inference thread always
+works on that newest frame, and the UI thread only paints finished results
+"""
+import threading
+import time
+
+
+class FpsMeter:
+    """Smoothed events-per-second counter"""
+
+    def __init__(self, smoothing=0.9):
+        self.smoothing = smoothing
+        self.fps = 0.0
+        self._last = None
+
+    def tick(self):
+        now = time.perf_counter()
+        if self._last is not None:
+            instant = 1.0 / max(now - self._last, 1e-6)
+            self.fps = instant if self.fps == 0 else self.smoothing * self.fps + (1 - self.smoothing) * instant
+        self._last = now
+
+
+class LatestValue:
+    """Thread-safe single slot that only ever holds the newest value"""
+
+    def __init__(self):
+        self._value = None
+        self._has_value = False
+        self._condition = threading.Condition()
+        self.dropped = 0
+
+    def put(self, value):
+        with self._condition:
+            if self._has_value:
+                self.dropped += 1
+            self._value = value
+            self._has_value = True
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """Take the newest value, waiting up to timeout; None if nothing arrived"""
+        with self._condition:
+            if not self._has_value and not self._condition.wait_for(lambda: self._has_value, timeout):
+                return None
+            value, self._value, self._has_value = self._value, None, False
+            return value
+
+
+class LivePipeline:
+    """
+    Runs capture and inference on background threads
+
+    process_frame(frame) is called on the inference thread and its return
+    value is published in self.results for the UI thread to pick up with
+    results.get(timeout=0). pace_fps throttles capture to a video file's
+    frame rate; leave it None for webcams, whose read() already blocks.
+    """
+
+    def __init__(self, capture, process_frame, pace_fps=None):
+        self.capture = capture
+        self.process_frame = process_frame
+        self.pace_fps = pace_fps
+        self.frames = LatestValue()
+        self.results = LatestValue()
+        self.capture_fps = FpsMeter()
+        self.inference_fps = FpsMeter()
+        self.finished = threading.Event()  # capture reached the end of the stream
+        self.done = threading.Event()      # inference thread has exited
+        self.error = None
+        self._running = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._running.set()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, daemon=True),
+            threading.Thread(target=self._inference_loop, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._running.clear()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads = []
+
+    def _capture_loop(self):
+        interval = 1.0 / self.pace_fps if self.pace_fps else 0
+        next_frame = time.perf_counter()
+        while self._running.is_set():
+            ret, frame = self.capture.read()
+            if not ret:
+                self.finished.set()
+                return
+            self.frames.put(frame)
+            self.capture_fps.tick()
+            if interval:
+                next_frame += interval
+                time.sleep(max(0.0, next_frame - time.perf_counter()))
+
+    def _inference_loop(self):
+        try:
+            while self._running.is_set():
+                frame = self.frames.get(timeout=0.1)
+                if frame is None:
+                    if self.finished.is_set():
+                        return
+                    continue
+                self.results.put(self.process_frame(frame))
+                self.inference_fps.tick()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
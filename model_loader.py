@@ -0,0 +1,244 @@
+"""
+Model export and runtime selection for CPU inference
+Exports trained .pt checkpoints to ONNX / OpenVINO and loads the fastest
+runtime available next to a checkpoint, with an equivalence check against
+the original PyTorch outputs
+
+Models can be referred to by name through the registry in models.json
+(name -> checkpoint, plus the default name), so shipping a retrained model
+means editing one file instead of every entry point.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+import detections as dets
+from dataset_split import list_images
+
+# Fastest first on our GPU-less edge boxes
+RUNTIME_PREFERENCE = ("openvino-int8", "openvino", "onnx", "pt")
+
+# Python package each exported runtime needs at inference time
+RUNTIME_PACKAGES = {"openvino-int8": "openvino", "openvino": "openvino", "onnx": "onnxruntime"}
+
+DEFAULT_VAL_IMAGES = "POC_split/val/images"
+
+# Registry name that lookup_model resolves to the registry's default model
+DEFAULT_MODEL = "default"
+
+# Named model versions; relative checkpoint paths are relative to this file
+REGISTRY_PATH = Path(os.environ.get("PRODETECT_REGISTRY", Path(__file__).resolve().parent / "models.json"))
+
+
+def load_registry(registry_path=REGISTRY_PATH):
+    """Read the model registry as ({name: checkpoint path}, default name)"""
+    registry_path = Path(registry_path)
+    with open(registry_path) as f:
+        registry = json.load(f)
+    models = {name: registry_path.parent / path for name, path in registry["models"].items()}
+    return models, registry["default"]
+
+
+def lookup_model(name_or_path, registry_path=REGISTRY_PATH):
+    """Resolve a registry name ("default" for the default one) to its checkpoint; paths pass through"""
+    name_or_path = str(name_or_path)
+    try:
+        models, default = load_registry(registry_path)
+    except FileNotFoundError:
+        return Path(name_or_path)
+    if name_or_path == "default":
+        name_or_path = default
+    return models.get(name_or_path, Path(name_or_path))
+
+
+def get_model_version(model_path):
+    """Identify a checkpoint by path and modification time for cache keys"""
+    try:
+        return f"{model_path}@{os.path.getmtime(model_path)}"
+    except OSError:
+        return str(model_path)
+
+
+def warm_up(model, imgsz=640, batch_size=1):
+    """Run a dummy batch so lazy initialization (graph compilation, allocations) happens before real traffic"""
+    dummy = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    model([dummy] * batch_size, imgsz=imgsz, verbose=False)
+
+
+def runtime_artifact(weights_path, runtime):
+    """Path where the exported artifact for a runtime lives"""
+    weights_path = Path(weights_path)
+    if runtime == "onnx":
+        return weights_path.with_suffix(".onnx")
+    if runtime == "openvino":
+        return weights_path.parent / f"{weights_path.stem}_openvino_model"
+    if runtime == "openvino-int8":
+        return weights_path.parent / f"{weights_path.stem}_int8_openvino_model"
+    return weights_path
+
+
+def available_runtimes(weights_path):
+    """Runtimes that have both an exported artifact and their package installed"""
+    runtimes = []
+    for runtime in RUNTIME_PREFERENCE:
+        package = RUNTIME_PACKAGES.get(runtime)
+        if package and importlib.util.find_spec(package) is None:
+            continue
+        if runtime_artifact(weights_path, runtime).exists():
+            runtimes.append(runtime)
+    return runtimes
+
+
+def resolve_model_path(weights_path, runtime="auto"):
+    """Pick the artifact to load: a specific runtime, or the fastest available"""
+    weights_path = lookup_model(weights_path)
+    if runtime == "auto":
+        runtimes = available_runtimes(weights_path)
+        runtime = runtimes[0] if runtimes else "pt"
+    return runtime_artifact(weights_path, runtime), runtime
+
+
+def load_model(weights_path, runtime="auto"):
+    """Load a YOLO model, preferring an exported CPU runtime over the .pt file"""
+    from ultralytics import YOLO
+
+    model_path, runtime = resolve_model_path(weights_path, runtime)
+    print(f"Loading {runtime} model from {model_path}...")
+    return YOLO(str(model_path), task="detect")
+
+
+def export_runtimes(weights_path, runtimes=("onnx", "openvino"), imgsz=640, data=None):
+    """
+    Export a trained checkpoint to CPU runtimes
+
+    Exports use dynamic shapes so the API can run batches of any size.
+    openvino-int8 needs data (a dataset yaml) for calibration.
+    Returns a dict of runtime -> exported path for the exports that succeeded.
+    """
+    from ultralytics import YOLO
+
+    exported = {}
+    for runtime in runtimes:
+        try:
+            model = YOLO(str(weights_path))
+            options = {"format": runtime, "imgsz": imgsz, "dynamic": True}
+            if runtime == "openvino-int8":
+                options.update(format="openvino", int8=True, data=data)
+            exported[runtime] = model.export(**options)
+            print(f"✓ Exported {runtime}: {exported[runtime]}")
+        except Exception as e:
+            print(f"⚠️ {runtime} export failed: {e}")
+    return exported
+
+
+def match_detections(reference, candidate, iou_threshold=0.5):
+    """Greedily match same-class boxes; return the IoU of each matched pair"""
+    ious = []
+    used = np.zeros(len(candidate), dtype=bool)
+    for box in reference:
+        same_class = (candidate[:, 5] == box[5]) & ~used
+        if not same_class.any():
+            continue
+        x1 = np.maximum(box[0], candidate[:, 0])
+        y1 = np.maximum(box[1], candidate[:, 1])
+        x2 = np.minimum(box[2], candidate[:, 2])
+        y2 = np.minimum(box[3], candidate[:, 3])
+        inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        area = (box[2] - box[0]) * (box[3] - box[1])
+        areas = (candidate[:, 2] - candidate[:, 0]) * (candidate[:, 3] - candidate[:, 1])
+        iou = np.where(same_class, inter / np.maximum(area + areas - inter, 1e-9), 0)
+        best = int(np.argmax(iou))
+        if iou[best] >= iou_threshold:
+            used[best] = True
+            ious.append(float(iou[best]))
+    return ious
+
+
+def verify_equivalence(weights_path, runtime, images_dir=DEFAULT_VAL_IMAGES,
+                       conf=0.25, min_match_rate=0.95):
+    """
+    Compare an exported runtime against the .pt outputs on validation images
+
+    Returns a report dict; report["passed"] is False when fewer than
+    min_match_rate of the PyTorch boxes have a same-class match at IoU 0.5.
+    """
+    from ultralytics import YOLO
+
+    reference_model = YOLO(str(weights_path))
+    candidate_model = YOLO(str(runtime_artifact(weights_path, runtime)), task="detect")
+
+    reference_boxes = 0
+    candidate_boxes = 0
+    ious = []
+    count_mismatches = 0
+    images = list_images(images_dir)
+    for image_path in images:
+        reference = dets.from_result(reference_model(str(image_path), conf=conf, verbose=False)[0])
+        candidate = dets.from_result(candidate_model(str(image_path), conf=conf, verbose=False)[0])
+        reference_boxes += len(reference)
+        candidate_boxes += len(candidate)
+        ious.extend(match_detections(reference, candidate))
+        if len(reference) != len(candidate):
+            count_mismatches += 1
+
+    match_rate = len(ious) / reference_boxes if reference_boxes else 1.0
+    report = {
+        "runtime": runtime,
+        "images": len(images),
+        "reference_boxes": reference_boxes,
+        "candidate_boxes": candidate_boxes,
+        "matched_boxes": len(ious),
+        "match_rate": match_rate,
+        "mean_iou": float(np.mean(ious)) if ious else None,
+        "images_with_count_mismatch": count_mismatches,
+        "passed": match_rate >= min_match_rate,
+    }
+    return report
+
+
+def remove_artifact(weights_path, runtime):
+    """Delete an exported artifact so load_model can no longer pick it"""
+    artifact = runtime_artifact(weights_path, runtime)
+    if artifact.is_dir():
+        shutil.rmtree(artifact)
+    elif artifact.exists() and artifact != Path(weights_path):
+        artifact.unlink()
+
+
+def export_and_verify(weights_path, imgsz=640, int8=False, data=None, images_dir=DEFAULT_VAL_IMAGES):
+    """
+    Export every CPU runtime and check each one against the .pt model
+
+    Exports that fail the equivalence check are deleted again.
+    """
+    runtimes = ("onnx", "openvino", "openvino-int8") if int8 else ("onnx", "openvino")
+    exported = export_runtimes(weights_path, runtimes, imgsz=imgsz, data=data)
+    reports = {}
+    for runtime in exported:
+        reports[runtime] = verify_equivalence(weights_path, runtime, images_dir=images_dir)
+        match_rate = reports[runtime]["match_rate"]
+        if reports[runtime]["passed"]:
+            print(f"✓ {runtime}: {match_rate:.1%} of boxes match the .pt model")
+        else:
+            print(f"⚠️ {runtime}: only {match_rate:.1%} of boxes match the .pt model, removing export")
+            remove_artifact(weights_path, runtime)
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a checkpoint to CPU runtimes and verify it")
+    parser.add_argument("weights", help="Path to the trained .pt checkpoint")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--int8", action="store_true", help="Also export a quantized OpenVINO model")
+    parser.add_argument("--data", default="POC_split/data.yaml", help="Calibration data for --int8")
+    parser.add_argument("--images", default=DEFAULT_VAL_IMAGES, help="Images for the equivalence check")
+    args = parser.parse_args()
+
+    reports = export_and_verify(args.weights, imgsz=args.imgsz, int8=args.int8,
+                                data=args.data, images_dir=args.images)
+    print(json.dumps(reports, indent=2))
@@ -0,0 +1,129 @@
+"""
+Shared fast-start path for the detection entry points
+Loads the model on a background thread, which is also where the heavy
+ultralytics / torch import happens, runs one warm-up inference so the first
+real detection does not pay for lazy initialization, and reports the time
+from process start to the first detection
+
+Callers keep doing their own setup (window, camera, image decoding) while
+the model loads and read state for progress. With cache_export, a
+checkpoint that has no exported runtime yet is exported (and verified) once
+after it is ready, so later starts load the faster OpenVINO / ONNX model.
+"""
+import importlib
+import threading
+import time
+
+from model_loader import (available_runtimes, export_and_verify, get_model_version, load_model, lookup_model,
+                          resolve_model_path, warm_up)
+
+# Reference point for time to first detection; entry points import this module early
+PROCESS_START = time.perf_counter()
+
+STATE_MESSAGES = {
+    "pending": "Waiting to load model",
+    "importing": "Importing detection libraries",
+    "loading": "Loading model",
+    "warming": "Warming up model",
+    "ready": "Model ready",
+    "failed": "Model failed to load",
+}
+
+
+class BackgroundModelLoader(threading.Thread):
+    """
+    Import, load and warm a model off the calling thread
+
+    state moves through pending -> importing -> loading -> warming -> ready
+    (or failed, with the exception in error). timings holds the seconds
+    spent in each step. wait() blocks until the model is ready. version
+    identifies the loaded artifact (path and mtime, as in the API), for
+    cache keys that must change when a name is re-pointed or retrained.
+    """
+
+    def __init__(self, weights_path="default", runtime="auto", imgsz=640, warmup=True, cache_export=False):
+        super().__init__(daemon=True)
+        self.weights_path = weights_path
+        self.runtime = runtime
+        self.imgsz = imgsz
+        self.warmup = warmup
+        self.cache_export = cache_export
+        self.state = "pending"
+        self.error = None
+        self.model = None
+        self.version = None
+        self.timings = {}
+        self.ready = threading.Event()
+        self._first_detection = None
+
+    def run(self):
+        try:
+            self._step("importing", importlib.import_module, "ultralytics")
+            self.version = get_model_version(resolve_model_path(self.weights_path, self.runtime)[0])
+            self.model = self._step("loading", load_model, self.weights_path, self.runtime)
+            if self.warmup:
+                self._step("warming", warm_up, self.model, self.imgsz)
+            self.state = "ready"
+        except Exception as e:
+            self.error = e
+            self.state = "failed"
+        finally:
+            self.ready.set()
+
+        if self.cache_export and self.state == "ready":
+            self.export_for_next_start()
+
+    def _step(self, state, fn, *args):
+        self.state = state
+        start = time.perf_counter()
+        result = fn(*args)
+        self.timings[state] = time.perf_counter() - start
+        return result
+
+    def export_for_next_start(self):
+        """Export a .pt-only checkpoint so the next start can load a faster runtime"""
+        weights_path = lookup_model(self.weights_path)
+        if weights_path.suffix != ".pt" or available_runtimes(weights_path) != ["pt"]:
+            return
+        print(f"Exporting {weights_path} to faster runtimes for the next start...")
+        try:
+            export_and_verify(weights_path, imgsz=self.imgsz)
+        except Exception as e:
+            print(f"⚠️ Export for faster start failed: {e}")
+
+    def wait(self, timeout=None):
+        """The loaded model; raises the load error, or TimeoutError if still loading"""
+        if not self.ready.wait(timeout):
+            raise TimeoutError(f"Model still loading ({self.state})")
+        if self.error is not None:
+            raise self.error
+        return self.model
+
+    @property
+    def status(self):
+        """Human-readable progress, e.g. for a status bar"""
+        message = STATE_MESSAGES[self.state]
+        if self.state == "ready":
+            return f"{message} in {sum(self.timings.values()):.1f}s"
+        if self.state == "failed":
+            return f"{message}: {self.error}"
+        return f"{message}..."
+
+    def report_first_detection(self):
+        """
+        Print the time from process start to the first detection, once
+
+        Returns the seconds, also on later calls.
+        """
+        if self._first_detection is None:
+            self._first_detection = time.perf_counter() - PROCESS_START
+            steps = ", ".join(f"{state} {seconds:.2f}s" for state, seconds in self.timings.items())
+            print(f"⏱ Time to first detection: {self._first_detection:.2f}s ({steps})")
+        return self._first_detection
+
+
+def start_model_loader(weights_path="default", runtime="auto", imgsz=640, warmup=True, cache_export=False):
+    """Start loading a model in the background and return its BackgroundModelLoader"""
+    loader = BackgroundModelLoader(weights_path, runtime, imgsz, warmup, cache_export)
+    loader.start()
+    return loader
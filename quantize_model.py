@@ -0,0 +1,185 @@
+"""
+Post-training INT8 quantization with an accuracy gate
+Calibrates an OpenVINO INT8 model on POC_split/train images, validates it
+on POC_split/val and only publishes it if mAP stays within tolerance.
+Writes a JSON report with accuracy and CPU latency/throughput side by side.
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from dataset_split import list_images
+from model_loader import export_runtimes, runtime_artifact
+
+
+def make_calibration_yaml(data_yaml, split="train"):
+    """
+    Write a temporary dataset yaml whose val split points at the calibration images
+
+    The exporter calibrates INT8 on the val split of the dataset it is given,
+    so this keeps calibration on training images and the real val split unseen.
+    """
+    data_yaml = Path(data_yaml)
+    with open(data_yaml) as f:
+        data = yaml.safe_load(f)
+
+    # A directory or a manifest .txt image list, both relative to the yaml
+    calibration_images = (data_yaml.parent / data.get(split, f"{split}/images")).resolve()
+    calibration = {
+        "path": str(data_yaml.parent.resolve()),
+        "train": str(calibration_images),
+        "val": str(calibration_images),
+        "nc": data["nc"],
+        "names": data["names"],
+    }
+    handle = tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False)
+    with handle:
+        yaml.safe_dump(calibration, handle)
+    return handle.name
+
+
+def validate(model_path, data_yaml, imgsz):
+    """Run validation on the dataset's val split and return mAP numbers"""
+    from ultralytics import YOLO
+
+    metrics = YOLO(str(model_path), task="detect").val(
+        data=str(data_yaml), split="val", imgsz=imgsz, batch=1, device="cpu",
+        plots=False, verbose=False
+    )
+    return {"map50": float(metrics.box.map50), "map50_95": float(metrics.box.map)}
+
+
+def measure_latency(model_path, images, imgsz, warmup=5):
+    """Time single-image CPU inference over a list of image paths"""
+    from ultralytics import YOLO
+
+    model = YOLO(str(model_path), task="detect")
+    for image_path in images[:warmup]:
+        model(str(image_path), imgsz=imgsz, verbose=False)
+
+    latencies = []
+    for image_path in images:
+        start = time.perf_counter()
+        model(str(image_path), imgsz=imgsz, verbose=False)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies = np.array(latencies)
+    return {
+        "images": len(latencies),
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "images_per_sec": float(1000 / latencies.mean()),
+    }
+
+
+def publish_artifact(staged_path, published_path):
+    """Move a staged export into place, replacing the published one only at the end"""
+    previous_path = published_path.with_name(published_path.name + ".previous")
+    if previous_path.exists():
+        shutil.rmtree(previous_path)
+    if published_path.exists():
+        published_path.rename(previous_path)
+    staged_path.rename(published_path)
+    if previous_path.exists():
+        shutil.rmtree(previous_path)
+
+
+def quantize(weights_path, data_yaml="POC_split/data.yaml", imgsz=640,
+             max_map_drop=0.01, latency_images=50):
+    """
+    Quantize a checkpoint to INT8 and publish it only if it passes the accuracy gate
+
+    max_map_drop is the largest allowed absolute drop in mAP50-95 versus the
+    fp32 .pt model. Returns the report dict, also written next to the weights.
+    """
+    weights_path = Path(weights_path)
+    published_path = runtime_artifact(weights_path, "openvino-int8")
+    # The val split as a directory or a manifest written by the split scripts
+    val_images = list_images(Path(data_yaml).parent / "val" / "images")[:latency_images]
+    if not val_images:
+        raise RuntimeError(f"No val images found next to {data_yaml}")
+
+    # Export from a copy of the checkpoint in a staging directory next to it,
+    # so an INT8 model that is already published stays in place (and
+    # loadable) unless the new one passes the gate
+    staging_dir = Path(tempfile.mkdtemp(prefix=f".{weights_path.stem}_int8_staging_", dir=weights_path.parent))
+    try:
+        staged_weights = staging_dir / weights_path.name
+        shutil.copy2(weights_path, staged_weights)
+        calibration_yaml = make_calibration_yaml(data_yaml)
+        try:
+            exported = export_runtimes(staged_weights, ("openvino-int8",), imgsz=imgsz, data=calibration_yaml)
+        finally:
+            Path(calibration_yaml).unlink()
+        if "openvino-int8" not in exported:
+            raise RuntimeError("INT8 export failed")
+        staging_path = runtime_artifact(staged_weights, "openvino-int8")
+
+        print("\n📊 Validating fp32 and INT8 models on the val split...")
+        fp32_accuracy = validate(weights_path, data_yaml, imgsz)
+        int8_accuracy = validate(staging_path, data_yaml, imgsz)
+
+        print(f"⏱️ Measuring CPU latency on {len(val_images)} images...")
+        fp32_latency = measure_latency(weights_path, val_images, imgsz)
+        int8_latency = measure_latency(staging_path, val_images, imgsz)
+
+        map_drop = fp32_accuracy["map50_95"] - int8_accuracy["map50_95"]
+        passed = map_drop <= max_map_drop
+        if passed:
+            publish_artifact(staging_path, published_path)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    report = {
+        "weights": str(weights_path),
+        "imgsz": imgsz,
+        "max_map_drop": max_map_drop,
+        "map50_95_drop": map_drop,
+        "published": passed,
+        "int8_model": str(published_path) if passed else None,
+        "fp32": {**fp32_accuracy, **fp32_latency},
+        "int8": {**int8_accuracy, **int8_latency},
+        "speedup": fp32_latency["mean_ms"] / int8_latency["mean_ms"],
+    }
+    report_path = weights_path.with_name(f"{weights_path.stem}_int8_report.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'='*60}")
+    print(f"{'':10}{'mAP50':>10}{'mAP50-95':>12}{'p50 ms':>10}{'img/s':>10}")
+    for name in ("fp32", "int8"):
+        row = report[name]
+        print(f"{name:10}{row['map50']:>10.3f}{row['map50_95']:>12.3f}"
+              f"{row['p50_ms']:>10.1f}{row['images_per_sec']:>10.1f}")
+    print(f"{'='*60}")
+    print(f"Speedup: {report['speedup']:.2f}x, mAP50-95 drop: {map_drop:.4f} (max {max_map_drop})")
+    if passed:
+        print(f"✅ INT8 model published: {published_path}")
+    elif published_path.exists():
+        print(f"❌ INT8 model rejected: accuracy drop exceeds tolerance (kept the published {published_path})")
+    else:
+        print("❌ INT8 model rejected: accuracy drop exceeds tolerance")
+    print(f"📄 Report: {report_path}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="INT8-quantize a checkpoint with an accuracy gate")
+    parser.add_argument("weights", nargs="?", default="runs/detect/poc_final_training/weights/best.pt")
+    parser.add_argument("--data", default="POC_split/data.yaml")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--max-map-drop", type=float, default=0.01,
+                        help="Largest allowed absolute mAP50-95 drop versus fp32")
+    parser.add_argument("--latency-images", type=int, default=50)
+    args = parser.parse_args()
+
+    report = quantize(args.weights, data_yaml=args.data, imgsz=args.imgsz,
+                      max_map_drop=args.max_map_drop, latency_images=args.latency_images)
+    raise SystemExit(0 if report["published"] else 1)
@@ -1,30 +1,31 @@
 """
 Split augmented dataset into train and validation sets
 70% training, 30% validation
+
+The split is written as train.txt / val.txt image lists by default (no
+files are copied); use --mode hardlink/symlink/copy for a directory layout.
 """
-import os
-import shutil
+import argparse
 from pathlib import Path
 import random
 
+from dataset_split import SPLIT_MODES, load_class_names, write_split
+from label_index import load_label_index
+
+parser = argparse.ArgumentParser(description="Random 70/30 train/val split")
+parser.add_argument('source', nargs='?', default='POC_augmented', help="Dataset with images/ and labels/")
+parser.add_argument('--output', default='POC_split')
+parser.add_argument('--mode', choices=SPLIT_MODES, default='manifest')
+args = parser.parse_args()
+
 # Set seed for reproducibility
 random.seed(42)
 
 # Paths
-source_images = Path("POC_augmented/images")
-source_labels = Path("POC_augmented/labels")
-
-train_images = Path("POC_split/train/images")
-train_labels = Path("POC_split/train/labels")
-val_images = Path("POC_split/val/images")
-val_labels = Path("POC_split/val/labels")
-
-# Create directories
-for path in [train_images, train_labels, val_images, val_labels]:
-    path.mkdir(parents=True, exist_ok=True)
+source_images = Path(args.source) / "images"
 
 # Get all image files
-all_images = list(source_images.glob("*.jpg"))
+all_images = sorted(source_images.glob("*.jpg"))
 print(f"Total images: {len(all_images)}")
 
 # Shuffle
@@ -38,28 +39,20 @@ val_imgs = all_images[split_idx:]
 print(f"Training images: {len(train_imgs)}")
 print(f"Validation images: {len(val_imgs)}")
 
-# Copy training files
-print("\nCopying training files...")
-for img_file in train_imgs:
-    # Copy image
-    shutil.copy(img_file, train_images / img_file.name)
-    
-    # Copy label
-    label_file = source_labels / f"{img_file.stem}.txt"
-    if label_file.exists():
-        shutil.copy(label_file, train_labels / label_file.name)
+# Write the split (manifest or links, copying only as a fallback)
+print(f"\nWriting split ({args.mode})...")
+data_yaml = write_split({"train": train_imgs, "val": val_imgs}, args.output,
+                        mode=args.mode, names=load_class_names())
 
-# Copy validation files
-print("Copying validation files...")
-for img_file in val_imgs:
-    # Copy image
-    shutil.copy(img_file, val_images / img_file.name)
-    
-    # Copy label
-    label_file = source_labels / f"{img_file.stem}.txt"
-    if label_file.exists():
-        shutil.copy(label_file, val_labels / label_file.name)
+# Class distribution straight from the cached label index
+index = load_label_index(Path(args.source) / "labels", train_imgs + val_imgs)
+train_class_counts = index.class_counts(range(len(train_imgs)))
+val_class_counts = index.class_counts(range(len(train_imgs), len(index)))
+print("\n📊 Class distribution (train / val):")
+for class_id, (train_count, val_count) in enumerate(zip(train_class_counts, val_class_counts)):
+    print(f"  Class {class_id}: {train_count} / {val_count} instances")
 
 print("\n✅ Dataset split complete!")
-print(f"📁 Train: POC_split/train/ ({len(train_imgs)} images)")
-print(f"📁 Val: POC_split/val/ ({len(val_imgs)} images)")
+print(f"📁 Train: {len(train_imgs)} images")
+print(f"📁 Val: {len(val_imgs)} images")
+print(f"📄 Dataset config: {data_yaml}")
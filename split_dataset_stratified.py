@@ -1,107 +1,87 @@
 """
 Split augmented dataset into train and validation sets WITH STRATIFICATION
-Ensures each class (0, 1, 2) is proportionally represented in both train and val
+Balances the box count of every class (0, 1, 2) across train and val, over
+all labels in each file, and keeps each source image together with its
+augmented copies (12, 12_aug0, 12_aug1, ...) so none of them leak into val
 70% training, 30% validation
+
+The split is written as train.txt / val.txt image lists by default (no
+files are copied); use --mode hardlink/symlink/copy for a directory layout.
 """
-import os
-import shutil
+import argparse
 from pathlib import Path
-import random
-from collections import defaultdict
 
-# Set seed for reproducibility
-random.seed(42)
+import numpy as np
 
-# Paths
-source_images = Path("POC_augmented/images")
-source_labels = Path("POC_augmented/labels")
+from dataset_split import SPLIT_MODES, iterative_stratification, load_class_names, write_split
+from label_index import load_label_index
 
-train_images = Path("POC_split/train/images")
-train_labels = Path("POC_split/train/labels")
-val_images = Path("POC_split/val/images")
-val_labels = Path("POC_split/val/labels")
+parser = argparse.ArgumentParser(description="Group-aware stratified 70/30 train/val split")
+parser.add_argument('source', nargs='?', default='POC_augmented',
+                    help="Dataset with images/ and labels/ (POC to split only the originals for on-the-fly augmentation)")
+parser.add_argument('--output', default='POC_split')
+parser.add_argument('--mode', choices=SPLIT_MODES, default='manifest')
+parser.add_argument('--val', type=float, default=0.3, help="Validation fraction")
+parser.add_argument('--seed', type=int, default=42)
+args = parser.parse_args()
 
-# Clear existing directories
-print("Clearing existing split directories...")
-for path in [train_images, train_labels, val_images, val_labels]:
-    if path.exists():
-        shutil.rmtree(path)
-    path.mkdir(parents=True, exist_ok=True)
+# Paths
+source_images = Path(args.source) / "images"
+source_labels = Path(args.source) / "labels"
 
-# Get all image files
-all_images = list(source_images.glob("*.jpg"))
+# Get all image files and look their labels up in the cached index
+all_images = sorted(source_images.glob("*.jpg"))
+index = load_label_index(source_labels, all_images)
 print(f"Total images: {len(all_images)}")
 
-# Group images by their primary class (first class in label file)
-class_to_images = defaultdict(list)
-for img_file in all_images:
-    label_file = source_labels / f"{img_file.stem}.txt"
-    if label_file.exists():
-        with open(label_file, 'r') as f:
-            first_line = f.readline().strip()
-            if first_line:
-                class_id = first_line.split()[0]
-                class_to_images[class_id].append(img_file)
+# Per-group class counts: a group is a source image plus its augmentations
+group_ids, group_names = index.groups()
+image_counts = index.count_matrix()
+num_classes = image_counts.shape[1]
+group_counts = np.zeros((len(group_names), num_classes), dtype=np.int64)
+np.add.at(group_counts, group_ids, image_counts)
+group_sizes = np.bincount(group_ids, minlength=len(group_names))
+print(f"Source groups: {len(group_names)}")
 
 # Print class distribution
 print("\n📊 Original class distribution:")
-for class_id in sorted(class_to_images.keys()):
-    print(f"  Class {class_id}: {len(class_to_images[class_id])} images")
-
-# Stratified split: 70-30 for each class
-train_imgs = []
-val_imgs = []
-
-for class_id, images in class_to_images.items():
-    random.shuffle(images)
-    split_idx = int(len(images) * 0.7)
-    train_imgs.extend(images[:split_idx])
-    val_imgs.extend(images[split_idx:])
-    print(f"  Class {class_id}: Train={split_idx}, Val={len(images)-split_idx}")
+for class_id, count in enumerate(index.class_counts()):
+    images_with_class = int((image_counts[:, class_id] > 0).sum())
+    print(f"  Class {class_id}: {count} instances in {images_with_class} images")
+
+# Iterative stratification over groups: 70-30 of every class's boxes
+group_split = iterative_stratification(group_counts, (1 - args.val, args.val),
+                                       group_sizes=group_sizes, seed=args.seed)
+image_split = group_split[group_ids]
+train_ids = np.flatnonzero(image_split == 0)
+val_ids = np.flatnonzero(image_split == 1)
+train_imgs = [all_images[i] for i in train_ids]
+val_imgs = [all_images[i] for i in val_ids]
+
+# No source image may have derivatives on both sides
+leaked = set(group_ids[train_ids]) & set(group_ids[val_ids])
+assert not leaked, f"Groups split across train and val: {sorted(group_names[g] for g in leaked)}"
 
 print(f"\n✅ Stratified split complete!")
-print(f"Training images: {len(train_imgs)}")
-print(f"Validation images: {len(val_imgs)}")
+print(f"Training images: {len(train_imgs)} ({int((group_split == 0).sum())} groups)")
+print(f"Validation images: {len(val_imgs)} ({int((group_split == 1).sum())} groups)")
 
-# Copy training files
-print("\nCopying training files...")
-for img_file in train_imgs:
-    shutil.copy(img_file, train_images / img_file.name)
-    label_file = source_labels / f"{img_file.stem}.txt"
-    if label_file.exists():
-        shutil.copy(label_file, train_labels / label_file.name)
-
-# Copy validation files
-print("Copying validation files...")
-for img_file in val_imgs:
-    shutil.copy(img_file, val_images / img_file.name)
-    label_file = source_labels / f"{img_file.stem}.txt"
-    if label_file.exists():
-        shutil.copy(label_file, val_labels / label_file.name)
+# Write the split (manifest or links, copying only as a fallback)
+print(f"\nWriting split ({args.mode})...")
+data_yaml = write_split({"train": train_imgs, "val": val_imgs}, args.output,
+                        mode=args.mode, names=load_class_names())
 
 # Verify class distribution in splits
-print("\n📊 TRAIN set class distribution:")
-train_class_counts = defaultdict(int)
-for label_file in train_labels.glob("*.txt"):
-    with open(label_file, 'r') as f:
-        for line in f:
-            class_id = line.strip().split()[0]
-            train_class_counts[class_id] += 1
-
-for class_id in sorted(train_class_counts.keys()):
-    print(f"  Class {class_id}: {train_class_counts[class_id]} instances")
-
-print("\n📊 VAL set class distribution:")
-val_class_counts = defaultdict(int)
-for label_file in val_labels.glob("*.txt"):
-    with open(label_file, 'r') as f:
-        for line in f:
-            class_id = line.strip().split()[0]
-            val_class_counts[class_id] += 1
-
-for class_id in sorted(val_class_counts.keys()):
-    print(f"  Class {class_id}: {val_class_counts[class_id]} instances")
+train_class_counts = index.class_counts(train_ids, num_classes)
+val_class_counts = index.class_counts(val_ids, num_classes)
+print("\n📊 Class distribution (train / val):")
+for class_id in range(num_classes):
+    total = train_class_counts[class_id] + val_class_counts[class_id]
+    val_share = val_class_counts[class_id] / total if total else 0.0
+    print(f"  Class {class_id}: {train_class_counts[class_id]} / {val_class_counts[class_id]} "
+          f"instances ({val_share:.0%} val)")
 
 print(f"\n✅ Dataset split complete!")
-print(f"📁 Train: POC_split/train/ ({len(train_imgs)} images)")
-print(f"📁 Val: POC_split/val/ ({len(val_imgs)} images)")
+print(f"📁 Train: {len(train_imgs)} images")
+print(f"📁 Val: {len(val_imgs)} images")
+print(f"📄 Dataset config: {data_yaml}")
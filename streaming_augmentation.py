@@ -0,0 +1,104 @@
+"""
+On-the-fly augmentation for Ultralytics training
+Generates the augmented copies that augment_dataset.py would write to disk
+lazily inside the data loader workers, from the original images only
+
+Each epoch walks every image num_augmentations + 1 times: once as the
+original and once per copy, with copy k seeded exactly like the k-th copy
+of augment_dataset.py. The copies are equivalent transforms, not
+byte-identical ones: augmentation runs on the image after Ultralytics has
+resized it, there is no second round of JPEG compression, and mosaic
+partners are drawn only from the training split rather than from every
+image in POC. No extra disk copies are written.
+"""
+from pathlib import Path
+
+import numpy as np
+from ultralytics.utils.instance import Instances
+from ultralytics.models.yolo.detect import DetectionTrainer
+
+from augmentation import augment_sample, sample_rng
+
+
+class StreamingAugmentDataset:
+    """
+    Wraps an Ultralytics YOLODataset and adds seeded augmented copies
+
+    Everything except indexing and length is delegated to the wrapped
+    dataset, so the trainer's collate_fn, close_mosaic and label plots keep
+    working unchanged. The copies are generated before the trainer's own
+    transforms (mosaic, HSV, flips) run, just as for images on disk.
+    """
+
+    def __init__(self, dataset, num_augmentations=3, seed=0, options=None):
+        self.dataset = dataset
+        self.copies = num_augmentations + 1
+        self.seed = seed
+        self.options = options
+
+    def __getattr__(self, name):
+        if name == "dataset":  # not set yet while unpickling in a loader worker
+            raise AttributeError(name)
+        return getattr(self.dataset, name)
+
+    def __len__(self):
+        return len(self.dataset) * self.copies
+
+    def __getitem__(self, index):
+        source, copy = divmod(index, self.copies)
+        if copy == 0:
+            return self.dataset[source]
+        return self.dataset.transforms(self.augmented_label(source, copy - 1))
+
+    def mosaic_partners(self, count, rng):
+        """Other training images for a mosaic, chosen by the sample's generator"""
+        partners = []
+        for index in rng.choice(len(self.dataset), size=count, replace=len(self.dataset) < count):
+            label = self.dataset.get_image_and_label(int(index))
+            partners.append((label["img"], label["cls"].reshape(-1), label["instances"].bboxes))
+        return partners
+
+    def augmented_label(self, source, aug_idx):
+        """Label dict for augmented copy aug_idx of one image, ready for the transforms"""
+        label = self.dataset.get_image_and_label(source)
+        label["instances"].convert_bbox("xywh")
+        rng = sample_rng(self.seed, Path(label["im_file"]).stem, aug_idx)
+        partners = self.mosaic_partners if len(self.dataset) > 1 else None
+        image, classes, boxes = augment_sample(
+            label["img"], label["cls"].reshape(-1), label["instances"].bboxes,
+            rng, self.options, mosaic_partners=partners
+        )
+        label["img"] = image
+        label["resized_shape"] = image.shape[:2]
+        label["cls"] = classes.reshape(-1, 1).astype(np.float32)
+        label["instances"] = Instances(
+            boxes, segments=np.zeros((0, 1000, 2), dtype=np.float32),
+            bbox_format="xywh", normalized=True
+        )
+        return label
+
+
+class StreamingAugmentTrainer(DetectionTrainer):
+    """DetectionTrainer whose training set is wrapped in a StreamingAugmentDataset"""
+
+    num_augmentations = 3
+    augment_options = None
+
+    def build_dataset(self, img_path, mode="train", batch=None):
+        dataset = super().build_dataset(img_path, mode, batch)
+        if mode != "train" or not self.num_augmentations:
+            return dataset
+        return StreamingAugmentDataset(dataset, self.num_augmentations, self.args.seed, self.augment_options)
+
+
+def make_trainer(num_augmentations=3, options=None, *bases):
+    """
+    Trainer class to pass as model.train(trainer=...)
+
+    Extra DetectionTrainer subclasses in bases (e.g. CachedImageTrainer)
+    are mixed in after the streaming wrapper.
+    """
+    return type("StreamingAugmentTrainer", (StreamingAugmentTrainer, *bases), {
+        "num_augmentations": num_augmentations,
+        "augment_options": options,
+    })
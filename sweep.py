@@ -0,0 +1,179 @@
+"""
+Hyperparameter / imgsz sweep for CPU deployment
+Trains every combination of model variant, imgsz and batch size on the POC
+split, runs several trials at once on disjoint core sets, and reports a
+Pareto table of validation mAP against measured CPU latency per image
+
+Each trial uses Ultralytics' patience-based early stopping (plus an
+optional per-trial time budget). Latency is measured after all training
+has finished, one model at a time with the same thread count, so trials do
+not slow each other's measurements down.
+
+Usage:
+    python sweep.py --models yolov8n.pt yolov8s.pt --imgsz 320 416 512 640 --batch 8 16
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from cpu_affinity import pin_worker, split_cores
+from dataset_split import list_images
+
+
+def trial_name(config):
+    return f"{Path(config['model']).stem}_{config['imgsz']}_b{config['batch']}"
+
+
+def init_trial_worker(core_queue):
+    cores = pin_worker(core_queue)
+    print(f"Trial worker {os.getpid()} pinned to cores {cores}")
+
+
+def run_trial(config, data, project, epochs, patience, time_budget=None):
+    """Train one configuration with early stopping and validate its best weights"""
+    from ultralytics import YOLO
+
+    name = trial_name(config)
+    model = YOLO(config["model"])
+    model.train(
+        data=data,
+        epochs=epochs,
+        patience=patience,
+        time=time_budget,
+        imgsz=config["imgsz"],
+        batch=config["batch"],
+        name=name,
+        project=project,
+        exist_ok=True,
+        device='cpu',
+        workers=2,
+        plots=False,
+        verbose=False
+    )
+    best = Path(model.trainer.best)
+    metrics = YOLO(str(best), task="detect").val(
+        data=data, split="val", imgsz=config["imgsz"], batch=1, device="cpu",
+        plots=False, verbose=False
+    )
+    return {
+        **config,
+        "name": name,
+        "weights": str(best),
+        "epochs_run": model.trainer.epoch + 1,
+        "map50": float(metrics.box.map50),
+        "map50_95": float(metrics.box.map),
+    }
+
+
+def pareto_front(results, accuracy="map50_95", latency="p50_ms"):
+    """Names of the trials that no other trial beats on both accuracy and latency"""
+    front = set()
+    for r in results:
+        dominated = any(
+            o[accuracy] >= r[accuracy] and o[latency] <= r[latency]
+            and (o[accuracy] > r[accuracy] or o[latency] < r[latency])
+            for o in results
+        )
+        if not dominated:
+            front.add(r["name"])
+    return front
+
+
+def print_table(results, front):
+    print(f"\n{'='*84}")
+    print("Sweep Results (★ = Pareto-optimal: no other trial is both more accurate and faster)")
+    print(f"{'='*84}")
+    print(f"  {'trial':<26}{'epochs':>7}{'mAP50':>8}{'mAP50-95':>10}{'p50 ms':>9}{'p95 ms':>9}{'img/s':>8}")
+    for r in sorted(results, key=lambda r: r["p50_ms"]):
+        star = "★" if r["name"] in front else " "
+        print(f"{star} {r['name']:<26}{r['epochs_run']:>7}{r['map50']:>8.3f}{r['map50_95']:>10.3f}"
+              f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['images_per_sec']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel model/imgsz/batch sweep with a Pareto table")
+    parser.add_argument('--data', default='POC_split/data.yaml')
+    parser.add_argument('--models', nargs='+', default=['yolov8n.pt'])
+    parser.add_argument('--imgsz', nargs='+', type=int, default=[320, 416, 512, 640])
+    parser.add_argument('--batch', nargs='+', type=int, default=[16])
+    parser.add_argument('--epochs', type=int, default=100)
+    parser.add_argument('--patience', type=int, default=15, help="Early stopping patience in epochs")
+    parser.add_argument('--time', type=float, default=None, help="Max hours per trial")
+    parser.add_argument('--parallel', type=int, default=max(1, (os.cpu_count() or 1) // 4),
+                        help="Trials trained at once (cores are split evenly between them)")
+    parser.add_argument('--val-images', default='POC_split/val/images', help="Images for the latency check")
+    parser.add_argument('--latency-images', type=int, default=50)
+    parser.add_argument('--project', default='runs/sweep')
+    args = parser.parse_args()
+
+    configs = [
+        {"model": m, "imgsz": s, "batch": b}
+        for m, s, b in itertools.product(args.models, args.imgsz, args.batch)
+    ]
+    results_path = Path(args.project) / "sweep_results.json"
+    results = {}
+    if results_path.exists():
+        with open(results_path) as f:
+            results = {r["name"]: r for r in json.load(f)}
+    todo = [c for c in configs if trial_name(c) not in results]
+    print(f"Sweep: {len(configs)} trials, {len(configs) - len(todo)} already done, {args.parallel} at a time")
+
+    def save():
+        results_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(results_path, 'w') as f:
+            json.dump(list(results.values()), f, indent=2)
+
+    # Phase 1: train in parallel, one core share per trial
+    if todo:
+        num_workers = min(args.parallel, len(todo))
+        ctx = multiprocessing.get_context("spawn")
+        core_queue = ctx.Queue()
+        for cores in split_cores(num_workers):
+            core_queue.put(cores)
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=ctx,
+                                 initializer=init_trial_worker, initargs=(core_queue,)) as executor:
+            futures = {
+                executor.submit(run_trial, c, args.data, args.project, args.epochs, args.patience, args.time): c
+                for c in todo
+            }
+            for future in as_completed(futures):
+                name = trial_name(futures[future])
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"❌ {name} failed: {e}")
+                    continue
+                results[name] = result
+                save()
+                print(f"✓ {name}: mAP50-95 {result['map50_95']:.3f} after {result['epochs_run']} epochs")
+
+    # Phase 2: latency, one model at a time with a fixed thread budget
+    import torch
+    from quantize_model import measure_latency
+
+    threads = max(1, len(split_cores(args.parallel)[0]))
+    torch.set_num_threads(threads)
+    images = list_images(args.val_images)[:args.latency_images]
+    for result in results.values():
+        if "p50_ms" in result and result.get("latency_threads") == threads:
+            continue
+        print(f"Timing {result['name']} on {len(images)} images with {threads} threads...")
+        result.update(measure_latency(result["weights"], images, result["imgsz"]))
+        result["latency_threads"] = threads
+        save()
+
+    timed = [r for r in results.values() if "p50_ms" in r]
+    front = pareto_front(timed)
+    for r in timed:
+        r["pareto"] = r["name"] in front
+    save()
+    print_table(timed, front)
+    print(f"\nResults written to: {results_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,20 @@
-from ultralytics import YOLO
+import argparse
 import cv2
 
-# Load your trained model
-model = YOLO('runs/detect/betty_haagen3/weights/best.pt')
+from model_startup import start_model_loader
+from tracking import FrameSkipDetector, draw_tracks
+
+parser = argparse.ArgumentParser(description="Live webcam detection")
+parser.add_argument('--track', action='store_true',
+                    help="Run the detector every N frames and track products in between")
+parser.add_argument('--every', type=int, default=5, help="Detector interval in frames when tracking")
+parser.add_argument('--motion-threshold', type=float, default=8.0,
+                    help="Mean pixel change that forces an early detector run (0 disables)")
+args = parser.parse_args()
+
+# Load and warm your trained model (fastest exported runtime if available)
+# in the background while the webcam opens
+loader = start_model_loader('betty_haagen3')  # registry name from models.json
 
 # Open webcam
 cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
@@ -11,30 +23,50 @@ if not cap.isOpened():
     print("Error: Cannot open webcam")
     exit()
 
+model = loader.wait()
+
 print("Webcam opened! Press 'q' to quit.")
 print("Model trained to detect:")
 print("  - Class 0: Betty Crocker Cake Mix")
 print("  - Class 1: Haagen-Dazs Ice Cream")
 
+frame_skipper = None
+if args.track:
+    frame_skipper = FrameSkipDetector(model, conf=0.25, detect_every=args.every,
+                                      motion_threshold=args.motion_threshold)
+    print(f"Tracking mode: detector every {args.every} frames or on motion")
+
 while cap.isOpened():
     ret, frame = cap.read()
     if not ret:
         break
     
-    # Run inference (lowered confidence to 0.25 for better detection)
-    results = model(frame, conf=0.25)
+    if frame_skipper:
+        # Detector on some frames only; tracks carry the boxes in between
+        tracks, _ = frame_skipper.process(frame)
+        annotated_frame = draw_tracks(frame, tracks, model.names)
+        total_objects = len(tracks)
+        class_counts = {}
+        for track in tracks:
+            class_name = model.names[track.cls]
+            class_counts[class_name] = class_counts.get(class_name, 0) + 1
+    else:
+        # Run inference (lowered confidence to 0.25 for better detection)
+        results = model(frame, conf=0.25)
+        
+        # Get annotated frame
+        annotated_frame = results[0].plot()
+        
+        # Count detections
+        total_objects = len(results[0].boxes)
+        class_counts = {}
+        
+        for box in results[0].boxes:
+            class_id = int(box.cls[0])
+            class_name = model.names[class_id]
+            class_counts[class_name] = class_counts.get(class_name, 0) + 1
     
-    # Get annotated frame
-    annotated_frame = results[0].plot()
-    
-    # Count detections
-    total_objects = len(results[0].boxes)
-    class_counts = {}
-    
-    for box in results[0].boxes:
-        class_id = int(box.cls[0])
-        class_name = model.names[class_id]
-        class_counts[class_name] = class_counts.get(class_name, 0) + 1
+    loader.report_first_detection()
     
     # Add total count
     cv2.putText(annotated_frame, f'Total: {total_objects}', 
@@ -47,6 +79,12 @@ while cap.isOpened():
                     (10, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
         y_offset += 30
     
+    # Running count of distinct products seen so far
+    if frame_skipper:
+        unique_counts = frame_skipper.tracker.unique_counts(model.names)
+        cv2.putText(annotated_frame, f'Unique seen: {sum(unique_counts.values())}',
+                    (10, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 200, 255), 2)
+    
     cv2.imshow('Betty & Haagen-Dazs Detection', annotated_frame)
     
     if cv2.waitKey(1) & 0xFF == ord('q'):
@@ -54,4 +92,8 @@ while cap.isOpened():
 
 cap.release()
 cv2.destroyAllWindows()
+if frame_skipper:
+    print(f"\nDetector ran on {frame_skipper.detector_ratio:.0%} of frames")
+    for class_name, count in frame_skipper.tracker.unique_counts(model.names).items():
+        print(f"  Unique {class_name}: {count}")
 print("\nTest complete!")
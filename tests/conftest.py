@@ -0,0 +1,7 @@
+"""Make the repository root modules and the API backend importable from the tests"""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "flutter_app" / "backend"))
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("fastapi")
+import api
+from fastapi import UploadFile
+
+
+def test_reload_applies_the_default_model_override(monkeypatch):
+    loaded = {}
+
+    async def fake_activate(name, path):
+        loaded[name] = path
+        return "v2", {0: 1.0}
+
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(api, "activate_model", fake_activate)
+    monkeypatch.setattr(api, "load_registry", lambda: ({"poc": Path("poc.pt"), "b": Path("b.pt")}, "poc"))
+    monkeypatch.setenv("PRODETECT_MODEL", "override.pt")
+
+    response = asyncio.run(api.reload_model("poc", x_admin_token="secret"))
+    assert response["success"]
+    assert loaded["poc"] == Path("override.pt")
+
+    asyncio.run(api.reload_model("b", x_admin_token="secret"))
+    assert loaded["b"] == Path("b.pt")
+
+
+class FakeWebSocket:
+    """Plays a scripted list of messages, then disconnects once every frame is answered"""
+
+    def __init__(self, messages, query_params=None):
+        self.messages = list(messages)
+        self.query_params = query_params or {}
+        self.sent = []
+        self.frames_left = sum(1 for m in messages if m.get("bytes"))
+        self.answered = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def close(self, code=1000):
+        self.closed = code
+
+    async def send_json(self, data):
+        self.sent.append(data)
+        if "frame" in data:
+            self.frames_left -= 1
+            if self.frames_left == 0:
+                self.answered.set()
+
+    async def receive(self):
+        if self.messages:
+            return {"type": "websocket.receive", **self.messages.pop(0)}
+        await self.answered.wait()
+        return {"type": "websocket.disconnect"}
+
+
+def test_stream_rejects_an_unknown_model_and_keeps_the_previous_one(monkeypatch):
+    used = []
+
+    async def fake_run_detection(frame, confidence, annotate, use_cache, model, reservation=None):
+        used.append(model)
+        return np.zeros((0, 6), dtype=np.float32), {}, None
+
+    monkeypatch.setattr(api, "run_detection", fake_run_detection)
+    monkeypatch.setattr(api.versions, "active", {"poc": "v1"})
+    websocket = FakeWebSocket([{"text": '{"model": "nope"}'}, {"bytes": b"frame"}], {"model": "poc"})
+
+    asyncio.run(api.detect_stream(websocket))
+
+    assert "unknown model nope" in websocket.sent[0]["error"]
+    assert used == ["poc"]
+
+
+def upload(name, contents):
+    """An in-memory upload, spooled like the ones FastAPI hands to endpoints"""
+    file = tempfile.SpooledTemporaryFile()
+    file.write(contents)
+    file.seek(0)
+    return UploadFile(file, filename=name)
+
+
+async def batch_lines(files):
+    response = await api.detect_batch(files, 0.25, "none", False, None)
+    return [json.loads(chunk) async for chunk in response.body_iterator]
+
+
+def test_batch_counts_unreadable_uploads_apart_from_images(monkeypatch):
+    async def fake_run_detection(contents, confidence, annotate, **kwargs):
+        return np.zeros((0, 6), dtype=np.float32), {}, None
+
+    monkeypatch.setattr(api, "run_detection", fake_run_detection)
+    files = [upload("shelf.jpg", b"jpeg"), upload("visit.zip", b"not a zip")]
+
+    lines = asyncio.run(batch_lines(files))
+
+    broken, = [line for line in lines if "upload" in line]
+    assert broken["upload"] == "visit.zip" and "index" not in broken
+    assert "zip file" in broken["error"]
+    summary = lines[-1]
+    assert summary["images"] == 1 and summary["failed"] == 0 and summary["failed_uploads"] == 1
+
+
+def test_batch_releases_every_reservation_when_the_client_disconnects(monkeypatch):
+    async def fake_run_detection(contents, confidence, annotate, **kwargs):
+        await asyncio.Event().wait()  # never finishes
+        return np.zeros((0, 6), dtype=np.float32), {}, None
+
+    async def disconnect_after_first_line():
+        # The corrupt zip's error line comes back before the image tasks ever start
+        files = [upload("visit.zip", b"not a zip")] + [upload(f"img{i}.jpg", b"image") for i in range(4)]
+        response = await api.detect_batch(files, 0.25, "none", False, None)
+        lines = response.body_iterator
+        first = json.loads(await lines.__anext__())
+        await lines.aclose()
+        await asyncio.sleep(0)  # let the cancelled tasks unwind
+        return first
+
+    monkeypatch.setattr(api, "run_detection", fake_run_detection)
+    assert asyncio.run(disconnect_after_first_line())["upload"] == "visit.zip"
+    assert api.memory_budget.reserved == 0
+
+
+def test_stream_rejects_oversized_frames_and_reserves_the_rest(monkeypatch):
+    held = []
+
+    async def fake_run_detection(frame, confidence, annotate, use_cache, model, reservation=None):
+        held.append(reservation.nbytes)
+        return np.zeros((0, 6), dtype=np.float32), {}, None
+
+    monkeypatch.setattr(api, "run_detection", fake_run_detection)
+    monkeypatch.setattr(api, "MAX_IMAGE_MB", 1)
+    websocket = FakeWebSocket([{"bytes": b"x" * (1024 * 1024 + 1)}, {"bytes": b"frame"}])
+
+    asyncio.run(api.detect_stream(websocket))
+
+    assert websocket.sent[0] == {"success": False, "frame": 1, "error": "Image larger than 1 MB"}
+    assert websocket.sent[1]["frame"] == 2 and websocket.sent[1]["success"]
+    assert held == [len(b"frame")]
+    assert api.memory_budget.reserved == 0
@@ -0,0 +1,22 @@
+import os
+
+import model_startup
+
+
+def test_loader_version_tracks_checkpoint_path_and_mtime(monkeypatch, tmp_path):
+    monkeypatch.setattr(model_startup.importlib, "import_module", lambda name: None)
+    monkeypatch.setattr(model_startup, "load_model", lambda path, runtime: object())
+    weights = tmp_path / "best.pt"
+    weights.write_bytes(b"weights")
+
+    def loaded_version():
+        loader = model_startup.start_model_loader(str(weights), runtime="pt", warmup=False)
+        loader.wait(timeout=5)
+        return loader.version
+
+    first = loaded_version()
+    assert first == f"{weights}@{os.path.getmtime(weights)}"
+
+    # Retraining in place changes the mtime, and with it the cache key
+    os.utime(weights, (os.path.getmtime(weights) + 10,) * 2)
+    assert loaded_version() != first
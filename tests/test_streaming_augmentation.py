@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("ultralytics")
+from streaming_augmentation import StreamingAugmentDataset
+
+
+class StubInstances:
+    def __init__(self, bboxes):
+        self.bboxes = bboxes
+        self.format = "xywh"
+
+    def convert_bbox(self, format):
+        self.format = format
+
+
+class StubDataset:
+    """Minimal stand-in for an Ultralytics YOLODataset"""
+
+    labels = ["kept for delegation"]
+
+    def __init__(self, count=3):
+        rng = np.random.default_rng(0)
+        self.images = [rng.integers(0, 255, (64, 80, 3), dtype=np.uint8) for _ in range(count)]
+
+    def __len__(self):
+        return len(self.images)
+
+    def get_image_and_label(self, index):
+        return {
+            "im_file": f"images/img{index}.jpg",
+            "img": self.images[index].copy(),
+            "cls": np.array([[0.0], [1.0]], dtype=np.float32),
+            "instances": StubInstances(np.array([[0.3, 0.3, 0.2, 0.2], [0.7, 0.6, 0.3, 0.4]], dtype=np.float32)),
+        }
+
+    def transforms(self, label):
+        return {**label, "transformed": True}
+
+    def __getitem__(self, index):
+        return self.transforms(self.get_image_and_label(index))
+
+
+def test_length_and_original_copies():
+    base = StubDataset()
+    dataset = StreamingAugmentDataset(base, num_augmentations=2, seed=1)
+
+    assert len(dataset) == len(base) * 3
+    original = dataset[3]  # image 1, copy 0
+    assert original["im_file"] == "images/img1.jpg"
+    np.testing.assert_array_equal(original["img"], base.images[1])
+    assert dataset.labels is base.labels  # everything else is delegated
+
+
+def test_augmented_copies_are_seeded_and_go_through_the_transforms():
+    dataset = StreamingAugmentDataset(StubDataset(), num_augmentations=2, seed=1)
+
+    first, again = dataset[4], dataset[4]  # image 1, copy 1
+    assert first["transformed"]
+    np.testing.assert_array_equal(first["img"], again["img"])
+    assert first["resized_shape"] == first["img"].shape[:2]
+    assert first["cls"].shape == (len(first["instances"].bboxes), 1)
+    assert first["instances"].bboxes.shape[1:] == (4,)
+
+    other_seed = StreamingAugmentDataset(StubDataset(), num_augmentations=2, seed=2)[4]
+    assert not np.array_equal(first["img"], other_seed["img"])
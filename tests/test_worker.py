@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+import worker
+from worker import DetectionJob, run_detection_batch
+
+
+class FakeModel:
+    names = {0: "Tub"}
+
+    def __call__(self, images, **kwargs):
+        return [SimpleNamespace(boxes=[]) for _ in images]
+
+
+class BrokenModel(FakeModel):
+    def __call__(self, images, **kwargs):
+        raise RuntimeError("forward pass failed")
+
+
+@pytest.fixture
+def image_bytes():
+    return cv2.imencode(".jpg", np.zeros((32, 32, 3), dtype=np.uint8))[1].tobytes()
+
+
+def test_failing_version_only_fails_its_own_jobs(monkeypatch, image_bytes):
+    monkeypatch.setattr(worker, "models", {"good": FakeModel(), "bad": BrokenModel()})
+    jobs = [
+        DetectionJob(image_bytes, annotate="none", model_version="good"),
+        DetectionJob(image_bytes, annotate="none", model_version="bad"),
+        DetectionJob(image_bytes, annotate="none", model_version="good"),
+    ]
+
+    responses = run_detection_batch(jobs)
+
+    assert isinstance(responses[1], RuntimeError)
+    for response in (responses[0], responses[2]):
+        assert response["names"] == FakeModel.names
+        assert response["detections"].shape == (0, 6)
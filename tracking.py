@@ -0,0 +1,184 @@
+"""
+Frame skipping with lightweight object tracking for live detection
+Runs the detector only every N frames (or when the scene moves) and carries
+boxes forward in between with a constant-velocity IoU tracker, giving each
+product a persistent ID and a de-duplicated count of unique products seen
+"""
+import cv2
+import numpy as np
+
+import detections as dets
+
+
+class Track:
+    def __init__(self, track_id, detection):
+        self.id = track_id
+        self.box = detection[:4].copy()
+        self.conf = float(detection[4])
+        self.cls = int(detection[5])
+        self.velocity = np.zeros(4, dtype=np.float32)
+        self.hits = 1
+        self.misses = 0
+        self.frames_since_update = 0
+
+    def predict(self):
+        """Move the box one frame along its estimated velocity"""
+        self.box = self.box + self.velocity
+        self.frames_since_update += 1
+
+    def update(self, detection):
+        # Correct the per-frame velocity by half the prediction error
+        observed = detection[:4]
+        if self.frames_since_update:
+            self.velocity = self.velocity + 0.5 * (observed - self.box) / self.frames_since_update
+        self.box = observed.copy()
+        self.conf = float(detection[4])
+        self.hits += 1
+        self.misses = 0
+        self.frames_since_update = 0
+
+
+class IouTracker:
+    """
+    Greedy same-class IoU tracker
+
+    A track is confirmed (and counted) once it has been matched min_hits
+    times, and dropped after max_misses detector runs without a match.
+    """
+
+    def __init__(self, iou_threshold=0.3, min_hits=2, max_misses=3):
+        self.iou_threshold = iou_threshold
+        self.min_hits = min_hits
+        self.max_misses = max_misses
+        self.tracks = []
+        self.next_id = 1
+        self.counted_ids = {}  # class id -> set of confirmed track ids
+
+    def predict(self):
+        for track in self.tracks:
+            track.predict()
+
+    def update(self, detections):
+        """Match a fresh detections array against the (already predicted) tracks"""
+        unmatched_tracks = list(range(len(self.tracks)))
+        unmatched_dets = list(range(len(detections)))
+
+        if self.tracks and len(detections):
+            track_boxes = np.array([t.box for t in self.tracks], dtype=np.float32)
+            ious = dets.iou_matrix(track_boxes, detections[:, :4])
+            track_cls = np.array([t.cls for t in self.tracks])
+            ious[track_cls[:, None] != detections[None, :, 5].astype(int)] = 0
+
+            # Greedy: best remaining pair first
+            for flat in np.argsort(-ious, axis=None):
+                t, d = np.unravel_index(flat, ious.shape)
+                if ious[t, d] < self.iou_threshold:
+                    break
+                if t in unmatched_tracks and d in unmatched_dets:
+                    self.tracks[t].update(detections[d])
+                    unmatched_tracks.remove(t)
+                    unmatched_dets.remove(d)
+
+        for t in unmatched_tracks:
+            self.tracks[t].misses += 1
+        for d in unmatched_dets:
+            self.tracks.append(Track(self.next_id, detections[d]))
+            self.next_id += 1
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+
+        for track in self.tracks:
+            if track.hits >= self.min_hits:
+                self.counted_ids.setdefault(track.cls, set()).add(track.id)
+
+    def active_tracks(self):
+        """Confirmed tracks that were seen by the detector recently"""
+        return [t for t in self.tracks if t.hits >= self.min_hits and t.misses == 0]
+
+    def unique_counts(self, names):
+        """Number of distinct products seen so far, per class name"""
+        return {names[cls_id]: len(ids) for cls_id, ids in sorted(self.counted_ids.items())}
+
+
+class MotionDetector:
+    """Cheap scene-change check on a small grayscale copy of each frame"""
+
+    def __init__(self, threshold=8.0, size=(64, 48)):
+        self.threshold = threshold
+        self.size = size
+        self.reference = None
+
+    def moved(self, frame):
+        small = cv2.cvtColor(cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA),
+                             cv2.COLOR_BGR2GRAY).astype(np.float32)
+        if self.reference is None:
+            self.reference = small
+            return True
+        return float(np.mean(np.abs(small - self.reference))) > self.threshold
+
+    def reset(self, frame):
+        """Use this frame as the new reference after running the detector"""
+        self.reference = None
+        self.moved(frame)
+
+
+class FrameSkipDetector:
+    """
+    Run the detector every detect_every frames, or sooner on motion
+
+    Between detector runs tracks are propagated by the tracker alone, so the
+    per-frame cost drops to a resize and a frame difference.
+    """
+
+    def __init__(self, model, conf=0.25, detect_every=5, motion_threshold=8.0, tracker=None):
+        self.model = model
+        self.conf = conf
+        self.detect_every = detect_every
+        self.motion = MotionDetector(motion_threshold) if motion_threshold else None
+        self.tracker = tracker or IouTracker()
+        self.frames_since_detect = None
+        self.detector_runs = 0
+        self.frames = 0
+
+    def process(self, frame):
+        """Update tracks for one frame; returns (active tracks, ran_detector)"""
+        self.frames += 1
+        self.tracker.predict()
+
+        run_detector = (
+            self.frames_since_detect is None
+            or self.frames_since_detect + 1 >= self.detect_every
+            or (self.motion is not None and self.motion.moved(frame))
+        )
+        if run_detector:
+            results = self.model(frame, conf=self.conf, verbose=False)
+            self.tracker.update(dets.from_result(results[0]))
+            self.frames_since_detect = 0
+            self.detector_runs += 1
+            if self.motion is not None:
+                self.motion.reset(frame)
+        else:
+            self.frames_since_detect += 1
+
+        return self.tracker.active_tracks(), run_detector
+
+    @property
+    def detector_ratio(self):
+        """Fraction of frames that ran the full detector"""
+        return self.detector_runs / self.frames if self.frames else 0.0
+
+
+def tracks_to_detections(tracks):
+    """Convert tracks into an (N, 6) detections array for counting and drawing"""
+    if not tracks:
+        return np.zeros((0, 6), dtype=np.float32)
+    return np.array([[*t.box, t.conf, t.cls] for t in tracks], dtype=np.float32)
+
+
+def draw_tracks(image, tracks, names):
+    """Draw tracked boxes labelled with their persistent IDs"""
+    from ultralytics.utils.plotting import Annotator, colors
+
+    annotator = Annotator(image.copy(), example=str(names))
+    for track in tracks:
+        annotator.box_label(track.box, f"#{track.id} {names[track.cls]}", color=colors(track.cls, True))
+    return annotator.result()
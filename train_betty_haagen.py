@@ -1,5 +1,7 @@
 from ultralytics import YOLO
 
+from model_loader import export_and_verify
+
 # Load pretrained YOLOv8n model
 model = YOLO('yolov8n.pt')
 
@@ -13,6 +15,9 @@ results = model.train(
     project='runs/detect'
 )
 
+# Export ONNX / OpenVINO runtimes for fast CPU inference
+export_and_verify(model.trainer.best, imgsz=640)
+
 print("\n✓ Training complete!")
 print(f"✓ Results saved to: runs/detect/betty_haagen")
 print(f"✓ Best weights: runs/detect/betty_haagen/weights/best.pt")
@@ -1,14 +1,38 @@
 """
 Train YOLO model with pretrained weights on properly split POC dataset
+
+With --stream-augment N the split should hold only original images (split
+POC/ instead of POC_augmented/); N augmented copies of each are generated
+on the fly in the data loader, so augment_dataset.py does not need to run.
 """
+import argparse
+
 from ultralytics import YOLO
 
+from image_cache import CachedImageTrainer
+from model_loader import export_and_verify
+from streaming_augmentation import make_trainer
+
+parser = argparse.ArgumentParser(description="Train YOLO on the POC split")
+parser.add_argument('--data', default='POC_split/data.yaml')
+parser.add_argument('--stream-augment', type=int, default=0, metavar='N',
+                    help="Augmented copies per image generated during training (0 = use pre-augmented images)")
+parser.add_argument('--image-cache', action=argparse.BooleanOptionalAction, default=True,
+                    help="Read pre-decoded, resized images from a memory-mapped cache")
+args = parser.parse_args()
+
+# Decode/resize each image once into a memory-mapped cache instead of every epoch
+trainer = CachedImageTrainer if args.image_cache else None
+if args.stream_augment:
+    trainer = make_trainer(args.stream_augment, None, *([trainer] if trainer else []))
+
 # Load pretrained model (much better starting point)
 model = YOLO('yolov8n.pt')  # Use pretrained weights on COCO dataset
 
 # Train the model on POC split dataset (260 train, 112 val)
 results = model.train(
-    data='POC_split/data.yaml',
+    trainer=trainer,
+    data=args.data,
     epochs=100,
     imgsz=640,
     batch=16,
@@ -28,6 +52,10 @@ metrics = model.val()
 # Save the final model
 model.save('runs/detect/poc_training/weights/best.pt')
 
+# Export ONNX / OpenVINO runtimes next to the best checkpoint and check
+# them against the PyTorch outputs on the validation split
+export_and_verify(model.trainer.best, imgsz=640)
+
 print("\n✅ Training complete!")
 print(f"📊 Results saved to: runs/detect/poc_training")
 print(f"🎯 Best model saved to: runs/detect/poc_training/weights/best.pt")